@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the Copilot Suggestion Engine
+Runs CopilotSuggestionEngine against a stub `gh` executable so throughput and
+tail latency can be compared across commits without a real GitHub CLI
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional
+
+import copilot_suggestion_engine
+from copilot_suggestion_engine import CopilotSuggestionEngine
+
+# Stub gh CLI; behaviour is controlled through FAKE_GH_* environment variables
+FAKE_GH_SCRIPT = '''#!{python}
+import os, random, sys, time
+
+args = sys.argv[1:]
+if args == ['--version']:
+    print('gh version 2.40.0 (fake)')
+    sys.exit(0)
+if args[:2] == ['extension', 'list']:
+    print('gh copilot\\tgithub/gh-copilot\\tv1.0.0')
+    sys.exit(0)
+if args[:2] == ['copilot', 'suggest']:
+    prompt = sys.stdin.read()
+    time.sleep(float(os.environ.get('FAKE_GH_LATENCY', '0.05')))
+    if random.random() < float(os.environ.get('FAKE_GH_FAILURE_RATE', '0')):
+        print('fake gh: simulated failure', file=sys.stderr)
+        sys.exit(1)
+    body = 'x = safe_call(arg)\\n' * max(1, int(os.environ.get('FAKE_GH_OUTPUT_BYTES', '512')) // 19)
+    sections = [line.split(' ', 3)[3] for line in prompt.splitlines()
+                if line.startswith('### BEGIN ISSUE ')]
+    # Avoid 'secure' and 'why' outside the headers: the parser treats such lines as section headers
+    answer = 'Fix:\\nUse the parameterised API\\n```\\n' + body + '```\\nExplanation:\\nThe original call is unsafe\\n'
+    if sections:
+        for issue_id in sections:
+            print(f'### BEGIN ISSUE {{issue_id}}\\n{{answer}}### END ISSUE {{issue_id}}')
+    else:
+        print(answer)
+    sys.exit(0)
+sys.exit(1)
+'''
+
+RULE_LINES = {
+    'python-hardcoded-secrets': 'password = "hunter{n}"',
+    'python-sql-injection': 'cursor.execute("SELECT * FROM t WHERE id = %s" % user_{n})',
+    'python-weak-crypto': 'digest_{n} = hashlib.md5(data).hexdigest()',
+    'javascript-eval-usage': 'eval(payload_{n})',
+}
+
+@dataclass
+class BenchmarkIssue:
+    """Minimal issue shape consumed by CopilotSuggestionEngine"""
+    id: str
+    rule_id: str
+    message: str
+    severity: str
+    type: str
+    file_path: str
+    line_number: int
+
+def install_fake_gh(directory: str) -> str:
+    """Write the stub gh script into directory and put it first on PATH"""
+    gh_path = os.path.join(directory, 'gh')
+    with open(gh_path, 'w') as f:
+        f.write(FAKE_GH_SCRIPT.format(python=sys.executable))
+    os.chmod(gh_path, 0o755)
+    os.environ['PATH'] = directory + os.pathsep + os.environ.get('PATH', '')
+    copilot_suggestion_engine.reset_copilot_availability()
+    return gh_path
+
+def make_issues(directory: str, count: int, lines_per_file: int = 200) -> List[BenchmarkIssue]:
+    """Create synthetic source files and one issue per vulnerable line"""
+    issues = []
+    rules = itertools.cycle(RULE_LINES.items())
+    files_needed = max(1, -(-count // lines_per_file))
+    for file_index in range(files_needed):
+        file_path = os.path.join(directory, f'module_{file_index}.py')
+        lines = []
+        for line_index in range(lines_per_file):
+            n = file_index * lines_per_file + line_index
+            rule_id, template = next(rules)
+            lines.append(template.format(n=n))
+            if n < count:
+                issues.append(BenchmarkIssue(
+                    id=f'bench-{n}', rule_id=rule_id, message=f'{rule_id} detected',
+                    severity='HIGH', type='VULNERABILITY',
+                    file_path=file_path, line_number=line_index + 1
+                ))
+        with open(file_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+    return issues
+
+def run_scenario(mode: str, issues: List[BenchmarkIssue], max_workers: int,
+                 cache_state: str, cache_dir: str, engine_options: Dict[str, Any],
+                 batch_size: int = 1) -> Dict[str, Any]:
+    """Run one benchmark scenario and return its measurements
+    
+    cache_state is 'cold' (empty cache), 'warm' (same engine, memory tier
+    filled) or 'disk-warm' (fresh engine over a filled on-disk cache).
+    """
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = CopilotSuggestionEngine(cache_dir=cache_dir, metrics_enabled=True, **engine_options)
+        if cache_state != 'cold':
+            engine.bulk_generate_suggestions(issues, max_workers=max_workers, batch_size=batch_size)
+            if cache_state == 'disk-warm':
+                engine = CopilotSuggestionEngine(cache_dir=cache_dir, metrics_enabled=True, **engine_options)
+            engine.reset_metrics()
+
+        started = time.perf_counter()
+        if mode == 'single':
+            for issue in issues:
+                engine.generate_security_suggestion(
+                    issue, engine._get_code_snippet(issue.file_path, issue.line_number))
+        else:
+            engine.bulk_generate_suggestions(issues, max_workers=max_workers, batch_size=batch_size)
+        elapsed = time.perf_counter() - started
+
+    metrics = engine.get_metrics()
+    latency = metrics['stages'].get('total', {})
+    return {
+        'mode': mode,
+        'issues': len(issues),
+        'max_workers': max_workers if mode == 'bulk' else 1,
+        'batch_size': batch_size if mode == 'bulk' else 1,
+        'cache_state': cache_state,
+        'elapsed_seconds': elapsed,
+        'issues_per_second': len(issues) / elapsed if elapsed else 0.0,
+        'latency_p50_seconds': latency.get('p50_seconds'),
+        'latency_p95_seconds': latency.get('p95_seconds'),
+        'latency_p99_seconds': latency.get('p99_seconds'),
+        'copilot': metrics['counters'],
+        'cache_hit_ratios': metrics['cache_hit_ratios'],
+    }
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description='Benchmark CopilotSuggestionEngine with a fake gh CLI')
+    parser.add_argument('--issues', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 5, 10])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1], help='issues per gh call in bulk mode')
+    parser.add_argument('--cache-states', nargs='+', choices=['cold', 'warm', 'disk-warm'],
+                        default=['cold', 'warm', 'disk-warm'])
+    parser.add_argument('--modes', nargs='+', choices=['single', 'bulk'], default=['single', 'bulk'])
+    parser.add_argument('--latency', type=float, default=0.05, help='fake gh latency in seconds')
+    parser.add_argument('--output-bytes', type=int, default=512, help='fake gh response body size')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of failing gh calls')
+    parser.add_argument('--cache-backend', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    os.environ['FAKE_GH_LATENCY'] = str(args.latency)
+    os.environ['FAKE_GH_OUTPUT_BYTES'] = str(args.output_bytes)
+    os.environ['FAKE_GH_FAILURE_RATE'] = str(args.failure_rate)
+
+    work_dir = tempfile.mkdtemp(prefix='copilot-bench-')
+    try:
+        install_fake_gh(work_dir)
+        results = []
+        for issue_count in args.issues:
+            source_dir = tempfile.mkdtemp(dir=work_dir)
+            issues = make_issues(source_dir, issue_count)
+            for mode, cache_state in itertools.product(args.modes, args.cache_states):
+                workers = args.workers if mode == 'bulk' else [1]
+                batch_sizes = args.batch_sizes if mode == 'bulk' else [1]
+                for max_workers, batch_size in itertools.product(workers, batch_sizes):
+                    results.append(run_scenario(
+                        mode, issues, max_workers, cache_state,
+                        os.path.join(work_dir, 'cache'), {'cache_backend': args.cache_backend},
+                        batch_size
+                    ))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'commit': current_commit(),
+        'python': platform.python_version(),
+        'fake_gh': {'latency_seconds': args.latency, 'output_bytes': args.output_bytes,
+                    'failure_rate': args.failure_rate},
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return report
+
+
+if __name__ == "__main__":
+    main()
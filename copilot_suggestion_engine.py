@@ -4,19 +4,69 @@ GitHub Copilot Integration for Security Scanner
 Provides AI-powered security fix suggestions using GitHub Copilot
 """
 
+import ast
+import asyncio
 import subprocess
 import json
 import os
 import re
-import tempfile
 import hashlib
+import sqlite3
+import struct
+import zlib
+import difflib
+import bisect
+import heapq
+import itertools
+import contextlib
+import functools
+import math
+import concurrent.futures
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass, asdict
+from typing import (Dict, List, Any, Optional, Tuple, AsyncIterator, Iterator, Callable,
+                    Mapping, NamedTuple)
+from types import MappingProxyType
+from dataclasses import dataclass, asdict, replace, field
 from pathlib import Path
+from collections import OrderedDict, deque
 import threading
 import time
 
+# Version tag for normalized cache keys (v1 keys are plain md5 of issue ID and snippet)
+CACHE_KEY_VERSION = "v2"
+
+# Line comment patterns per file extension; group 1 preserves string literals
+_STRING_LITERALS = r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')'
+_HASH_COMMENTS = re.compile(_STRING_LITERALS + r'|#.*$')
+_SLASH_COMMENTS = re.compile(_STRING_LITERALS + r'|//.*$')
+LINE_COMMENT_PATTERNS = {
+    '.py': _HASH_COMMENTS, '.rb': _HASH_COMMENTS, '.sh': _HASH_COMMENTS,
+    '.pl': _HASH_COMMENTS, '.r': _HASH_COMMENTS, '.yaml': _HASH_COMMENTS, '.yml': _HASH_COMMENTS,
+    '.js': _SLASH_COMMENTS, '.jsx': _SLASH_COMMENTS, '.ts': _SLASH_COMMENTS, '.tsx': _SLASH_COMMENTS,
+    '.java': _SLASH_COMMENTS, '.c': _SLASH_COMMENTS, '.cpp': _SLASH_COMMENTS, '.h': _SLASH_COMMENTS,
+    '.cs': _SLASH_COMMENTS, '.go': _SLASH_COMMENTS, '.php': _SLASH_COMMENTS, '.kt': _SLASH_COMMENTS,
+    '.swift': _SLASH_COMMENTS, '.rs': _SLASH_COMMENTS, '.scala': _SLASH_COMMENTS,
+}
+
+# Delimiters used to pack several issues into one batched Copilot request
+BATCH_BEGIN_MARKER = "### BEGIN ISSUE"
+BATCH_END_MARKER = "### END ISSUE"
+
+# Scheduling rank of issue severities and rule impact levels (lower runs first)
+SEVERITY_RANKS = {'BLOCKER': 0, 'CRITICAL': 0, 'HIGH': 1, 'MAJOR': 1, 'MEDIUM': 2,
+                  'MINOR': 3, 'LOW': 3, 'INFO': 4}
+UNKNOWN_SEVERITY_RANK = 5
+
+# Process-wide memoized result of the gh/Copilot availability probe
+_copilot_probe_result: Optional[bool] = None
+_copilot_probe_lock = threading.Lock()
+
+def reset_copilot_availability():
+    """Forget the memoized availability probe, e.g. after PATH changes"""
+    global _copilot_probe_result
+    with _copilot_probe_lock:
+        _copilot_probe_result = None
+
 @dataclass
 class CopilotSuggestion:
     """Copilot-generated suggestion for security fix"""
@@ -31,6 +81,19 @@ class CopilotSuggestion:
     fix_pattern: Optional[str] = None
     replacement_pattern: Optional[str] = None
 
+@dataclass(frozen=True)
+class CachePolicy:
+    """How suggestions from one source are cached"""
+    persist: bool
+    ttl: Optional[timedelta] = None  # None means the engine's cache_duration
+
+# Templates are rebuilt in microseconds, so they stay in memory only and briefly;
+# Copilot answers are expensive and persist for a week
+DEFAULT_CACHE_POLICIES = MappingProxyType({
+    'template': CachePolicy(persist=False, ttl=timedelta(hours=1)),
+    'github_copilot': CachePolicy(persist=True, ttl=timedelta(days=7)),
+})
+
 @dataclass
 class SecurityContext:
     """Security context for vulnerability"""
@@ -40,29 +103,1530 @@ class SecurityContext:
     recommended_tools: List[str]
     prevention_tips: List[str]
 
+class SuggestionMemoryCache:
+    """Bounded in-process LRU cache for suggestions (sits in front of the disk cache)"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[CopilotSuggestion, int, float]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    @staticmethod
+    def _estimate_size(suggestion: CopilotSuggestion) -> int:
+        """Approximate memory footprint of a suggestion from its text fields"""
+        return sum(len(value) for value in asdict(suggestion).values() if isinstance(value, str))
+
+    def get(self, cache_key: str) -> Optional[CopilotSuggestion]:
+        """Return the cached suggestion and mark it as most recently used"""
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            
+            suggestion, size, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[cache_key]
+                self._total_bytes -= size
+                return None
+            
+            self._entries.move_to_end(cache_key)
+            return suggestion
+
+    def put(self, cache_key: str, suggestion: CopilotSuggestion, expires_at: float):
+        """Insert or replace a suggestion, evicting least recently used entries"""
+        size = self._estimate_size(suggestion)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(cache_key, None)
+            if previous is not None:
+                self._total_bytes -= previous[1]
+
+            self._entries[cache_key] = (suggestion, size, expires_at)
+            self._total_bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries or
+                                     self._total_bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+                self.evictions += 1
+
+    def discard(self, cache_key: str):
+        """Remove a single entry if present"""
+        with self._lock:
+            entry = self._entries.pop(cache_key, None)
+            if entry is not None:
+                self._total_bytes -= entry[1]
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+@dataclass
+class FixRule:
+    """Compiled automated fix rule"""
+    rule_id: str
+    pattern: str
+    replacement: str
+    imports: List[str]
+    confidence: str
+    description: str
+    regex: "re.Pattern" = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.regex = re.compile(self.pattern)
+
+class FixRuleEngine:
+    """Fix rules compiled once, with a combined regex for single-pass scans
+    
+    Every rule's pattern becomes one named alternative of a combined regex, so
+    one scan over a snippet or a whole file finds matches for all rules and
+    applies their replacements in the same sweep. Rules that cannot be
+    combined (backreferences, named groups, global inline flags, or a
+    combined compile failure) are applied on their own after the sweep.
+    """
+
+    # Backreferences inside a replacement template (escaped backslashes are kept)
+    _TEMPLATE_REFERENCE = re.compile(r'\\\\|\\g<(\d+)>|\\(\d{1,2})')
+
+    # Pattern syntax that breaks inside a combined alternation: numbered
+    # backreferences and global inline flags (escaped backslashes are skipped)
+    _STANDALONE_SYNTAX = re.compile(r'\\\\|\\[1-9]|\(\?[aiLmsux]+\)')
+
+    def __init__(self, fix_patterns: Dict[str, Dict[str, Any]]):
+        self.rules: Dict[str, FixRule] = {}
+        for rule_id, fix_pattern in fix_patterns.items():
+            try:
+                self.rules[rule_id] = FixRule(
+                    rule_id=rule_id,
+                    pattern=fix_pattern['pattern'],
+                    replacement=fix_pattern['replacement'],
+                    imports=list(fix_pattern.get('imports', [])),
+                    confidence=fix_pattern.get('confidence', 'medium'),
+                    description=fix_pattern.get('description', 'Automated security fix applied')
+                )
+            except (KeyError, re.error) as e:
+                print(f"⚠️ Skipping invalid fix rule {rule_id}: {e}")
+
+        # Rules whose patterns cannot share a combined regex are applied one by one
+        self.standalone_rules: List[FixRule] = []
+        combinable = []
+        for rule in self.rules.values():
+            reason = self._standalone_reason(rule)
+            if reason:
+                print(f"⚠️ Fix rule {rule.rule_id} uses {reason}; applying it separately")
+                self.standalone_rules.append(rule)
+            else:
+                combinable.append(rule)
+
+        try:
+            self._build_combined(combinable)
+        except re.error:
+            # Find the offending rules by growing the alternation one rule at a time
+            accepted = []
+            for rule in combinable:
+                try:
+                    self._build_combined(accepted + [rule])
+                    accepted.append(rule)
+                except re.error as e:
+                    print(f"⚠️ Fix rule {rule.rule_id} cannot be combined ({e}); applying it separately")
+                    self.standalone_rules.append(rule)
+            self._build_combined(accepted)
+
+    def _standalone_reason(self, rule: FixRule) -> Optional[str]:
+        if rule.regex.groupindex:
+            return "named groups"
+        for match in self._STANDALONE_SYNTAX.finditer(rule.pattern):
+            if match.group(0).startswith('(?'):
+                return "inline flags"
+            if match.group(0) != '\\\\':
+                return "backreferences"
+        return None
+
+    def _build_combined(self, rules: List[FixRule]):
+        """Compile rules into one alternation; rule patterns keep their own numbered
+        groups, so replacement templates are shifted to the rule's group offset"""
+        group_rules: Dict[str, FixRule] = {}
+        group_templates: Dict[str, str] = {}
+        alternatives = []
+        group_offset = 0
+        for index, rule in enumerate(rules):
+            group_name = f"rule_{index}"
+            alternatives.append(f"(?P<{group_name}>{rule.pattern})")
+            group_offset += 1
+            group_rules[group_name] = rule
+            group_templates[group_name] = self._shift_template(rule.replacement, group_offset)
+            group_offset += rule.regex.groups
+        self.combined_regex = re.compile('|'.join(alternatives)) if alternatives else None
+        self._group_rules = group_rules
+        self._group_templates = group_templates
+
+    @classmethod
+    def from_file(cls, rules_file: str,
+                  base_patterns: Optional[Dict[str, Dict[str, Any]]] = None) -> "FixRuleEngine":
+        """Load rules from a JSON file, layered over base_patterns"""
+        return cls({**(base_patterns or {}), **cls.load_rule_file(rules_file)})
+
+    @staticmethod
+    def load_rule_file(rules_file: str) -> Dict[str, Dict[str, Any]]:
+        """Read a JSON rule file mapping rule_id to pattern, replacement, imports, ..."""
+        with open(rules_file, 'r') as f:
+            return json.load(f)
+
+    @classmethod
+    def _shift_template(cls, template: str, offset: int) -> str:
+        def shift(match):
+            number = match.group(1) or match.group(2)
+            if number is None:
+                return match.group(0)
+            # Group 0 maps to the rule's own named group, group N to N groups after it
+            return f"\\g<{int(number) + offset}>"
+        return cls._TEMPLATE_REFERENCE.sub(shift, template)
+
+    def get(self, rule_id: str) -> Optional[FixRule]:
+        return self.rules.get(rule_id)
+
+    def apply_rule(self, rule_id: str, code: str) -> Tuple[str, int]:
+        """Apply a single rule in one pass; returns (fixed code, replacement count)"""
+        rule = self.rules[rule_id]
+        return rule.regex.subn(rule.replacement, code)
+
+    def matching_rules(self, code: str) -> List[str]:
+        """Rule IDs with at least one match, found in a single scan"""
+        found = {}
+        if self.combined_regex is not None:
+            for match in self.combined_regex.finditer(code):
+                found.setdefault(self._group_rules[match.lastgroup].rule_id, None)
+        for rule in self.standalone_rules:
+            if rule.regex.search(code):
+                found.setdefault(rule.rule_id, None)
+        return list(found)
+
+    def apply_all(self, code: str) -> Tuple[str, Dict[str, int]]:
+        """Apply every rule in one sweep; returns (fixed code, replacements per rule)"""
+        counts: Dict[str, int] = {}
+
+        def substitute(match):
+            rule = self._group_rules[match.lastgroup]
+            counts[rule.rule_id] = counts.get(rule.rule_id, 0) + 1
+            return match.expand(self._group_templates[match.lastgroup])
+
+        if self.combined_regex is not None:
+            code = self.combined_regex.sub(substitute, code)
+        for rule in self.standalone_rules:
+            code, replaced = rule.regex.subn(rule.replacement, code)
+            if replaced:
+                counts[rule.rule_id] = counts.get(rule.rule_id, 0) + replaced
+        return code, counts
+
+# Fallback template for rules without a dedicated one
+DEFAULT_TEMPLATE = MappingProxyType({
+    'suggestion': 'Review and fix this security vulnerability according to security best practices',
+    'code_example': '// Implement secure coding practices\n// Follow OWASP guidelines',
+    'explanation': 'This code contains a security vulnerability that should be addressed according to security best practices.'
+})
+
+# Rule knowledge base shipped next to this module (one JSON record per line)
+DEFAULT_RULES_FILE = Path(__file__).with_name("copilot_rules.jsonl")
+
+class RuleRecord(NamedTuple):
+    """Security context, fix pattern and template for one rule"""
+    rule_id: str
+    security_context: Optional[SecurityContext]
+    fix_pattern: Optional[Mapping[str, Any]]
+    template: Optional[Mapping[str, str]]
+
+class RuleRegistry:
+    """Immutable rule knowledge base keyed by rule_id, loaded lazily
+    
+    The rules file holds one JSON record per line, each starting with its
+    rule_id. The first lookup indexes line offsets by rule_id; a record is
+    parsed only the first time its rule is used. Use get_rule_registry() to
+    share one registry per rules file across engine instances.
+    """
+
+    _RULE_ID_PREFIX = re.compile(rb'^\{\s*"rule_id"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+    def __init__(self, rules_file: Path):
+        self.rules_file = Path(rules_file)
+        self._offsets: Optional[Dict[str, int]] = None
+        self._records: Dict[str, Optional[RuleRecord]] = {}
+        self._fix_patterns: Optional[Mapping[str, Mapping[str, Any]]] = None
+        self._fix_engine: Optional[FixRuleEngine] = None
+        self._lock = threading.Lock()
+
+    def _index(self) -> Dict[str, int]:
+        if self._offsets is None:
+            offsets = {}
+            with open(self.rules_file, 'rb') as f:
+                offset = 0
+                for line in f:
+                    match = self._RULE_ID_PREFIX.match(line)
+                    if match:
+                        offsets[json.loads(b'"' + match.group(1) + b'"')] = offset
+                    offset += len(line)
+            self._offsets = offsets
+        return self._offsets
+
+    def _read_record(self, offset: int) -> RuleRecord:
+        with open(self.rules_file, 'rb') as f:
+            f.seek(offset)
+            data = json.loads(f.readline())
+        context = data.get('security_context')
+        fix_pattern = data.get('fix_pattern')
+        template = data.get('template')
+        return RuleRecord(
+            rule_id=data['rule_id'],
+            security_context=SecurityContext(**context) if context else None,
+            fix_pattern=MappingProxyType(fix_pattern) if fix_pattern else None,
+            template=MappingProxyType(template) if template else None
+        )
+
+    def get(self, rule_id: str) -> Optional[RuleRecord]:
+        """Return the record for rule_id, loading it on first use"""
+        try:
+            return self._records[rule_id]
+        except KeyError:
+            pass
+        with self._lock:
+            if rule_id not in self._records:
+                offset = self._index().get(rule_id)
+                self._records[rule_id] = self._read_record(offset) if offset is not None else None
+            return self._records[rule_id]
+
+    def rule_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._index())
+
+    def fix_patterns(self) -> Mapping[str, Mapping[str, Any]]:
+        """All fix patterns by rule_id (loads every record that has one)"""
+        if self._fix_patterns is None:
+            patterns = {}
+            for rule_id in self.rule_ids():
+                record = self.get(rule_id)
+                if record.fix_pattern:
+                    patterns[rule_id] = record.fix_pattern
+            self._fix_patterns = MappingProxyType(patterns)
+        return self._fix_patterns
+
+    def fix_engine(self) -> FixRuleEngine:
+        """Compiled fix rules shared by every engine using this registry"""
+        if self._fix_engine is None:
+            engine = FixRuleEngine(self.fix_patterns())
+            with self._lock:
+                if self._fix_engine is None:
+                    self._fix_engine = engine
+        return self._fix_engine
+
+class RuleRegistryView(Mapping):
+    """Read-only rule_id -> field mapping over a RuleRegistry"""
+
+    def __init__(self, registry: RuleRegistry, field_name: str):
+        self._registry = registry
+        self._field_name = field_name
+
+    def __getitem__(self, rule_id: str):
+        record = self._registry.get(rule_id)
+        value = getattr(record, self._field_name) if record else None
+        if value is None:
+            raise KeyError(rule_id)
+        return value
+
+    def __iter__(self):
+        return (rule_id for rule_id in self._registry.rule_ids() if rule_id in self)
+
+    def __contains__(self, rule_id) -> bool:
+        record = self._registry.get(rule_id)
+        return record is not None and getattr(record, self._field_name) is not None
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+_rule_registries: Dict[Path, RuleRegistry] = {}
+_rule_registries_lock = threading.Lock()
+
+def get_rule_registry(rules_file: Optional[str] = None) -> RuleRegistry:
+    """Process-wide shared registry for a rules file"""
+    path = Path(rules_file or DEFAULT_RULES_FILE).resolve()
+    with _rule_registries_lock:
+        if path not in _rule_registries:
+            _rule_registries[path] = RuleRegistry(path)
+        return _rule_registries[path]
+
+# Languages each built-in rule family applies to when scanning whole files
+RULE_PREFIX_EXTENSIONS = {
+    'python-': ('.py',),
+    'javascript-': ('.js', '.jsx', '.ts', '.tsx', '.mjs', '.cjs'),
+}
+
+# Per-process state for repository fix workers
+_worker_fix_patterns: Dict[str, Dict[str, Any]] = {}
+_worker_fix_engines: Dict[frozenset, FixRuleEngine] = {}
+
+def _init_fix_worker(fix_patterns: Dict[str, Dict[str, Any]]):
+    """Process pool initializer: receive the fix rules once per worker"""
+    global _worker_fix_patterns
+    _worker_fix_patterns = fix_patterns
+    _worker_fix_engines.clear()
+
+def _imported_names(nodes) -> set:
+    """(module, name) pairs bound by import statements; name is None for plain imports"""
+    names = set()
+    for node in nodes:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                names.add((alias.name, alias.asname))
+                if alias.asname is None:
+                    # `import os.path` also binds `os`
+                    names.add((alias.name.split('.')[0], None))
+        elif isinstance(node, ast.ImportFrom):
+            names.update((f"{'.' * node.level}{node.module or ''}:{alias.name}", alias.asname)
+                         for alias in node.names)
+    return names
+
+def _add_missing_imports(code: str, imports: List[str]) -> Tuple[str, List[str]]:
+    """Insert import lines not already present
+    
+    Python sources get new imports after the module docstring, __future__
+    imports and the leading import block; an import counts as present when
+    an existing statement binds the same names (e.g. `import os, sys`).
+    Sources that do not parse fall back to inserting after a shebang or
+    encoding header.
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        tree = None
+
+    if tree is None:
+        existing = {line.strip() for line in code.splitlines()}
+        missing = [line for line in imports if line not in existing]
+    else:
+        existing_names = _imported_names(tree.body)
+        missing = []
+        for line in imports:
+            try:
+                required = _imported_names(ast.parse(line).body)
+            except SyntaxError:
+                required = None
+            if required is None or not required <= existing_names:
+                missing.append(line)
+    if not missing:
+        return code, []
+
+    lines = code.splitlines(keepends=True)
+    insert_at = 0
+    if tree is None:
+        while insert_at < len(lines) and insert_at < 2 and lines[insert_at].startswith('#'):
+            insert_at += 1
+    else:
+        body = tree.body
+        index = 0
+        if (body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant)
+                and isinstance(body[0].value.value, str)):
+            insert_at = body[0].end_lineno
+            index = 1
+        while index < len(body) and isinstance(body[index], (ast.Import, ast.ImportFrom)):
+            insert_at = body[index].end_lineno
+            index += 1
+        if insert_at == 0:
+            while insert_at < len(lines) and insert_at < 2 and lines[insert_at].startswith('#'):
+                insert_at += 1
+    newline = '\r\n' if '\r\n' in code else '\n'
+    if insert_at and insert_at <= len(lines) and not lines[insert_at - 1].endswith(('\n', '\r')):
+        lines[insert_at - 1] += newline
+    lines[insert_at:insert_at] = [line + newline for line in missing]
+    return ''.join(lines), missing
+
+def _compiles(code: str, file_path: str) -> bool:
+    try:
+        compile(code, file_path, 'exec', dont_inherit=True)
+        return True
+    except (SyntaxError, ValueError):
+        return False
+
+def _fix_source_files(jobs: List[Tuple[str, str, List[str]]], write: bool) -> List[Dict[str, Any]]:
+    """Apply fix rules to a batch of files; runs inside a process pool worker
+    
+    Each job is (file path, path shown in the diff header, rule IDs).
+    """
+    results = []
+    for file_path, diff_path, rule_ids in jobs:
+        result = {'file_path': file_path, 'diff': '', 'applied_rules': {},
+                  'added_imports': [], 'written': False}
+        try:
+            rule_set = frozenset(rule_ids)
+            engine = _worker_fix_engines.get(rule_set)
+            if engine is None:
+                engine = FixRuleEngine({rule_id: _worker_fix_patterns[rule_id] for rule_id in rule_set})
+                _worker_fix_engines[rule_set] = engine
+
+            with open(file_path, 'r', encoding='utf-8', errors='surrogateescape', newline='') as f:
+                original = f.read()
+
+            fixed, applied = engine.apply_all(original)
+            if applied:
+                required_imports = []
+                for rule_id in applied:
+                    for import_line in engine.get(rule_id).imports:
+                        if import_line not in required_imports:
+                            required_imports.append(import_line)
+                fixed, result['added_imports'] = _add_missing_imports(fixed, required_imports)
+
+                result['applied_rules'] = applied
+                result['diff'] = ''.join(difflib.unified_diff(
+                    original.splitlines(keepends=True), fixed.splitlines(keepends=True),
+                    fromfile=f"a/{diff_path}", tofile=f"b/{diff_path}"
+                ))
+                if (write and file_path.endswith('.py') and _compiles(original, file_path)
+                        and not _compiles(fixed, file_path)):
+                    # Never replace valid Python with a file that no longer compiles
+                    result['error'] = "fixed source does not compile; file left unchanged"
+                elif write:
+                    with open(file_path, 'w', encoding='utf-8', errors='surrogateescape', newline='') as f:
+                        f.write(fixed)
+                    result['written'] = True
+        except Exception as e:
+            result['error'] = str(e)
+        results.append(result)
+    return results
+
+# Latency histogram bucket upper bounds in seconds (Prometheus-style, +Inf implied)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+
+class _StageTimer:
+    """Context manager recording one stage duration into SuggestionMetrics"""
+    __slots__ = ('_metrics', '_stage', '_started')
+
+    def __init__(self, metrics: "SuggestionMetrics", stage: str):
+        self._metrics = metrics
+        self._stage = stage
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._metrics.observe(self._stage, time.perf_counter() - self._started)
+        return False
+
+_NULL_STAGE = contextlib.nullcontext()
+
+class SuggestionMetrics:
+    """Per-stage latency histograms and event counters for the suggestion pipeline
+    
+    When disabled, stage() returns a shared no-op context manager and count()
+    returns immediately, so instrumentation costs one attribute check.
+    """
+
+    def __init__(self, enabled: bool = False,
+                 sink: Optional[Callable[[str, float], None]] = None,
+                 reservoir_size: int = 4096):
+        self.enabled = enabled
+        self.sink = sink
+        self.reservoir_size = reservoir_size
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._samples: Dict[str, deque] = {}
+            self._buckets: Dict[str, List[int]] = {}
+            self._totals: Dict[str, float] = {}
+            self._counts: Dict[str, int] = {}
+            self.counters: Dict[str, int] = {'copilot_success': 0, 'copilot_timeout': 0,
+                                             'copilot_failure': 0}
+
+    def stage(self, name: str):
+        """Time the enclosed block as the given stage"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _StageTimer(self, name)
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            if name not in self._samples:
+                self._samples[name] = deque(maxlen=self.reservoir_size)
+                self._buckets[name] = [0] * (len(LATENCY_BUCKETS) + 1)
+                self._totals[name] = 0.0
+                self._counts[name] = 0
+            self._samples[name].append(seconds)
+            self._buckets[name][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self._totals[name] += seconds
+            self._counts[name] += 1
+        if self.sink:
+            self.sink(name, seconds)
+
+    def count(self, name: str, amount: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-stage count, mean and p50/p95/p99 (from recent samples) plus counters"""
+        with self._lock:
+            stages = {}
+            for name, samples in self._samples.items():
+                ordered = sorted(samples)
+                stages[name] = {
+                    'count': self._counts[name],
+                    'mean_seconds': self._totals[name] / self._counts[name],
+                    'p50_seconds': _percentile(ordered, 50),
+                    'p95_seconds': _percentile(ordered, 95),
+                    'p99_seconds': _percentile(ordered, 99),
+                }
+            return {'stages': stages, 'counters': dict(self.counters)}
+
+    def to_prometheus(self, prefix: str = "copilot_suggestion") -> str:
+        """Render histograms and counters in the Prometheus text exposition format"""
+        lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+        with self._lock:
+            for name in sorted(self._buckets):
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS + (float('inf'),), self._buckets[name]):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {self._totals[name]}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {self._counts[name]}')
+            for name in sorted(self.counters):
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                lines.append(f"{prefix}_{name}_total {self.counters[name]}")
+        return '\n'.join(lines) + '\n'
+
+def _percentile(ordered: List[float], percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, math.ceil(percent * len(ordered) / 100) - 1))
+    return ordered[rank]
+
+def _timed_stage(stage_name: str):
+    """Decorator timing an engine method as a metrics stage"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not self.metrics.enabled:
+                return method(self, *args, **kwargs)
+            with self.metrics.stage(stage_name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one execution"""
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error: Optional[BaseException] = None
+
+    def __init__(self):
+        self._calls: Dict[str, "SingleFlight._Call"] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn) -> Tuple[Any, bool]:
+        """Run fn once per key among concurrent callers
+        
+        Returns (result, shared) where shared is True for callers that waited
+        on another caller's execution. Exceptions are re-raised in every caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+class CopilotProcessGroup:
+    """gh processes started by one bulk run, killed together once its deadline passes"""
+
+    def __init__(self):
+        self._processes: set = set()
+        self._lock = threading.Lock()
+        self.cancelled = False
+
+    def add(self, process: subprocess.Popen):
+        """Track a started process; it is killed at once if the group is already cancelled"""
+        with self._lock:
+            if not self.cancelled:
+                self._processes.add(process)
+                return
+        process.kill()
+
+    def discard(self, process: subprocess.Popen):
+        with self._lock:
+            self._processes.discard(process)
+
+    def cancel(self) -> int:
+        """Kill every tracked process and any started later; returns the number killed"""
+        with self._lock:
+            self.cancelled = True
+            processes, self._processes = self._processes, set()
+        for process in processes:
+            try:
+                process.kill()
+            except OSError:
+                pass
+        return len(processes)
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on concurrent Copilot calls driven by observed latency and errors
+    
+    Every call that succeeds within latency_target grows the limit by 1/limit
+    (about +1 per window of calls); a timeout, failure or slow call multiplies
+    it by backoff. Calls started before the last decrease cannot shrink the
+    limit again, so one burst of simultaneous timeouts halves it once.
+    """
+
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 16,
+                 latency_target: float = 15.0, backoff: float = 0.5):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Concurrency limits must satisfy 1 <= min <= initial <= max")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> float:
+        """Block until a slot is free; returns the start time to pass to release()"""
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+        return time.monotonic()
+
+    def release(self, started: float, success: Optional[bool] = None):
+        """Free a slot and adjust the limit from the call's outcome and latency
+        
+        success=None frees a slot whose call was never made.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if success is None:
+                pass
+            elif success and time.monotonic() - started <= self.latency_target:
+                if self._limit < self.max_limit:
+                    self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                    self.increases += 1
+            elif started >= self._last_decrease and self._limit > self.min_limit:
+                self._limit = max(self.min_limit, self._limit * self.backoff)
+                self._last_decrease = time.monotonic()
+                self.decreases += 1
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {'limit': int(self._limit), 'in_flight': self._in_flight,
+                    'min_limit': self.min_limit, 'max_limit': self.max_limit,
+                    'increases': self.increases, 'decreases': self.decreases}
+
+class CircuitBreaker:
+    """Short-circuits Copilot calls after consecutive timeouts
+    
+    closed: calls pass; failure_threshold consecutive timeouts open the circuit.
+    open: calls are refused until cool_down seconds have passed.
+    half_open: a single probe call is let through; its success closes the
+    circuit and any failure re-opens it for another cool-down.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cool_down: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.cool_down = cool_down
+        self._state = "closed"
+        self._consecutive_timeouts = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.times_opened = 0
+        self.short_circuited = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.cool_down:
+                return "half_open"
+            return self._state
+
+    def allow_request(self, claim_probe: bool = True) -> bool:
+        """Whether a Copilot call may be made now
+        
+        With claim_probe=False a half-open circuit is reported as passable
+        without reserving its single probe call.
+        """
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.cool_down:
+                self._state = "half_open"
+            if self._state == "half_open" and not self._probe_in_flight:
+                if claim_probe:
+                    self._probe_in_flight = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive_timeouts = 0
+            self._probe_in_flight = False
+            self._state = "closed"
+
+    def release_probe(self):
+        """Give back a claimed half-open probe whose call ended without an outcome"""
+        with self._lock:
+            if self._state == "half_open":
+                self._probe_in_flight = False
+
+    def record_failure(self, timed_out: bool) -> bool:
+        """Record a failed call; returns True when this failure opened the circuit"""
+        with self._lock:
+            if self._state == "half_open":
+                self._probe_in_flight = False
+                return self._open()
+            if not timed_out or self._state == "open":
+                return False
+            self._consecutive_timeouts += 1
+            if self._state == "closed" and self._consecutive_timeouts >= self.failure_threshold:
+                return self._open()
+            return False
+
+    def _open(self) -> bool:
+        self._state = "open"
+        self._opened_at = time.monotonic()
+        self._consecutive_timeouts = 0
+        self.times_opened += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {'state': state, 'consecutive_timeouts': self._consecutive_timeouts,
+                    'failure_threshold': self.failure_threshold, 'cool_down_seconds': self.cool_down,
+                    'times_opened': self.times_opened, 'short_circuited': self.short_circuited}
+
+class SourceLineIndex:
+    """Source file contents with the offset at which every line starts"""
+
+    def __init__(self, content: str, signature: Tuple[int, int]):
+        self.content = content
+        # (mtime_ns, size) of the file when it was read
+        self.signature = signature
+        self.offsets = [0]
+        position = content.find('\n')
+        while position != -1:
+            self.offsets.append(position + 1)
+            position = content.find('\n', position + 1)
+        if self.offsets[-1] != len(content):
+            self.offsets.append(len(content))
+
+    @classmethod
+    def from_file(cls, file_path: str, signature: Tuple[int, int]) -> "SourceLineIndex":
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            return cls(f.read(), signature)
+
+    @property
+    def line_count(self) -> int:
+        return len(self.offsets) - 1
+
+    def snippet(self, line_number: int, context_lines: int = 5) -> str:
+        """Lines around line_number (1-based), matching readlines() slicing"""
+        start = max(0, line_number - context_lines - 1)
+        end = min(self.line_count, line_number + context_lines)
+        if end <= start:
+            return ""
+        return self.content[self.offsets[start]:self.offsets[end]]
+
+def _over_cache_limits(entries: int, size_bytes: int,
+                       max_entries: Optional[int], max_bytes: Optional[int]) -> bool:
+    """Whether a cache exceeds its entry or byte cap (None means unbounded)"""
+    return ((max_entries is not None and entries > max_entries) or
+            (max_bytes is not None and size_bytes > max_bytes))
+
+# Compact binary cache record: magic, record length, flags, enum codes,
+# generated_at as integer microseconds since the epoch, then length-prefixed strings
+RECORD_MAGIC = b'\xc5\x01'
+_RECORD_HEADER = struct.Struct('<2sIBBBq')
+_FIELD_LENGTH = struct.Struct('<I')
+_EPOCH = datetime(1970, 1, 1)
+
+SOURCE_CODES = {'template': 1, 'github_copilot': 2}
+CONFIDENCE_CODES = {'low': 1, 'medium': 2, 'high': 3}
+_SOURCE_NAMES = {code: name for name, code in SOURCE_CODES.items()}
+_CONFIDENCE_NAMES = {code: name for name, code in CONFIDENCE_CODES.items()}
+
+_FLAG_AUTOMATED_FIX = 0x01
+_FLAG_COMPRESSED_EXAMPLE = 0x02
+_FLAG_FIX_PATTERN = 0x04
+_FLAG_REPLACEMENT_PATTERN = 0x08
+
+# code_example bodies above this size are zlib-compressed when that makes them smaller
+COMPRESSION_THRESHOLD = 1024
+
+def encode_suggestion_record(data: Dict[str, Any]) -> bytes:
+    """Encode an asdict(CopilotSuggestion) record in the compact binary format"""
+    flags = _FLAG_AUTOMATED_FIX if data['automated_fix_available'] else 0
+
+    code_example = data['code_example'].encode('utf-8')
+    if len(code_example) > COMPRESSION_THRESHOLD:
+        compressed = zlib.compress(code_example)
+        if len(compressed) < len(code_example):
+            code_example = compressed
+            flags |= _FLAG_COMPRESSED_EXAMPLE
+
+    fields = [data['issue_id'].encode('utf-8'), data['suggestion_text'].encode('utf-8'),
+              code_example, data['explanation'].encode('utf-8')]
+    if data.get('fix_pattern') is not None:
+        flags |= _FLAG_FIX_PATTERN
+        fields.append(data['fix_pattern'].encode('utf-8'))
+    if data.get('replacement_pattern') is not None:
+        flags |= _FLAG_REPLACEMENT_PATTERN
+        fields.append(data['replacement_pattern'].encode('utf-8'))
+
+    # Values without an enum code (0) are stored as trailing strings
+    source_code = SOURCE_CODES.get(data['source'], 0)
+    if not source_code:
+        fields.append(data['source'].encode('utf-8'))
+    confidence_code = CONFIDENCE_CODES.get(data['confidence'], 0)
+    if not confidence_code:
+        fields.append(data['confidence'].encode('utf-8'))
+
+    generated_at = datetime.fromisoformat(data['generated_at'])
+    if generated_at.tzinfo is not None:
+        generated_at = generated_at.astimezone().replace(tzinfo=None)
+    generated_at_us = (generated_at - _EPOCH) // timedelta(microseconds=1)
+
+    body = b''.join(_FIELD_LENGTH.pack(len(value)) + value for value in fields)
+    header = _RECORD_HEADER.pack(RECORD_MAGIC, _RECORD_HEADER.size + len(body), flags,
+                                 source_code, confidence_code, generated_at_us)
+    return header + body
+
+def decode_suggestion_record(blob) -> Dict[str, Any]:
+    """Decode a cache record; accepts the binary format and legacy JSON"""
+    if isinstance(blob, str):
+        return json.loads(blob)
+    if not blob.startswith(RECORD_MAGIC):
+        return json.loads(blob)
+
+    _, length, flags, source_code, confidence_code, generated_at_us = _RECORD_HEADER.unpack_from(blob)
+    if length != len(blob):
+        raise ValueError(f"Truncated cache record ({len(blob)} of {length} bytes)")
+
+    fields = []
+    offset = _RECORD_HEADER.size
+    while offset < length:
+        (size,) = _FIELD_LENGTH.unpack_from(blob, offset)
+        offset += _FIELD_LENGTH.size
+        fields.append(blob[offset:offset + size])
+        offset += size
+    fields.reverse()
+
+    def text() -> str:
+        return fields.pop().decode('utf-8')
+
+    issue_id, suggestion_text = text(), text()
+    code_example = fields.pop()
+    if flags & _FLAG_COMPRESSED_EXAMPLE:
+        code_example = zlib.decompress(code_example)
+    explanation = text()
+    fix_pattern = text() if flags & _FLAG_FIX_PATTERN else None
+    replacement_pattern = text() if flags & _FLAG_REPLACEMENT_PATTERN else None
+    source = _SOURCE_NAMES[source_code] if source_code else text()
+    confidence = _CONFIDENCE_NAMES[confidence_code] if confidence_code else text()
+
+    return {
+        'issue_id': issue_id,
+        'suggestion_text': suggestion_text,
+        'code_example': code_example.decode('utf-8'),
+        'explanation': explanation,
+        'confidence': confidence,
+        'source': source,
+        'generated_at': (_EPOCH + timedelta(microseconds=generated_at_us)).isoformat(),
+        'automated_fix_available': bool(flags & _FLAG_AUTOMATED_FIX),
+        'fix_pattern': fix_pattern,
+        'replacement_pattern': replacement_pattern
+    }
+
+class JSONDirectoryStore:
+    """Disk cache backend storing one file per cache key
+    
+    Records are written as <key>.json, or as compact <key>.bin records when
+    binary is set; files in either format are read back.
+    """
+
+    SUFFIXES = ('.json', '.bin')
+
+    def __init__(self, cache_dir: Path, binary: bool = False):
+        self.cache_dir = cache_dir
+        self.binary = binary
+        # File mtime tracks last access; access counts for LFU are kept per process
+        self._access_counts: Dict[str, int] = {}
+
+    def _path(self, cache_key: str, suffix: Optional[str] = None) -> Path:
+        return self.cache_dir / f"{cache_key}{suffix or ('.bin' if self.binary else '.json')}"
+
+    def _cache_files(self) -> Iterator[Path]:
+        for suffix in self.SUFFIXES:
+            yield from self.cache_dir.glob(f"*{suffix}")
+
+    @staticmethod
+    def _read(cache_file: Path) -> Dict[str, Any]:
+        return decode_suggestion_record(cache_file.read_bytes())
+
+    def load(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Return the raw cache record, or None if the key is not stored"""
+        preferred = '.bin' if self.binary else '.json'
+        for suffix in (preferred,) + tuple(s for s in self.SUFFIXES if s != preferred):
+            cache_file = self._path(cache_key, suffix)
+            if cache_file.exists():
+                data = self._read(cache_file)
+                os.utime(cache_file)
+                self._access_counts[cache_key] = self._access_counts.get(cache_key, 0) + 1
+                return data
+        return None
+
+    def save(self, cache_key: str, data: Dict[str, Any]):
+        if self.binary:
+            self._path(cache_key).write_bytes(encode_suggestion_record(data))
+            self._path(cache_key, '.json').unlink(missing_ok=True)
+        else:
+            with open(self._path(cache_key), 'w') as f:
+                json.dump(data, f, indent=2)
+
+    def delete(self, cache_key: str):
+        for suffix in self.SUFFIXES:
+            self._path(cache_key, suffix).unlink(missing_ok=True)
+        self._access_counts.pop(cache_key, None)
+
+    def clear(self):
+        for cache_file in list(self._cache_files()):
+            cache_file.unlink(missing_ok=True)
+        self._access_counts.clear()
+
+    def expire(self, cutoff: datetime, batch_size: int = 500) -> int:
+        """Remove every record generated before cutoff; returns the number removed"""
+        removed = 0
+        for index, cache_file in enumerate(list(self._cache_files()), 1):
+            try:
+                generated_at = datetime.fromisoformat(self._read(cache_file)['generated_at'])
+            except Exception:
+                generated_at = None
+            if generated_at is None or generated_at < cutoff:
+                cache_file.unlink(missing_ok=True)
+                self._access_counts.pop(cache_file.stem, None)
+                removed += 1
+            if index % batch_size == 0:
+                # Yield between batches so request threads are not starved
+                time.sleep(0)
+        return removed
+
+    def evict(self, max_entries: Optional[int], max_bytes: Optional[int],
+              policy: str = "lru") -> int:
+        """Remove least recently (or least frequently) used records until under the caps"""
+        entries = []
+        for cache_file in self._cache_files():
+            try:
+                stat = cache_file.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((cache_file, stat.st_mtime, stat.st_size))
+
+        total_entries = len(entries)
+        total_bytes = sum(size for _, _, size in entries)
+        if not _over_cache_limits(total_entries, total_bytes, max_entries, max_bytes):
+            return 0
+
+        if policy == "lfu":
+            entries.sort(key=lambda e: (self._access_counts.get(e[0].stem, 0), e[1]))
+        else:
+            entries.sort(key=lambda e: e[1])
+
+        evicted = 0
+        for cache_file, _, size in entries:
+            if not _over_cache_limits(total_entries, total_bytes, max_entries, max_bytes):
+                break
+            cache_file.unlink(missing_ok=True)
+            self._access_counts.pop(cache_file.stem, None)
+            total_entries -= 1
+            total_bytes -= size
+            evicted += 1
+        return evicted
+
+    def stats(self) -> Tuple[int, int]:
+        """Return (entry count, total bytes)"""
+        cache_files = list(self._cache_files())
+        return len(cache_files), sum(f.stat().st_size for f in cache_files)
+
+class SQLiteSuggestionStore:
+    """Disk cache backend using a single indexed SQLite database in WAL mode"""
+
+    def __init__(self, db_path: Path, binary: bool = False):
+        self.db_path = db_path
+        self.binary = binary
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS suggestions ("
+            " cache_key TEXT PRIMARY KEY,"
+            " generated_at REAL NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " data TEXT NOT NULL,"
+            " last_accessed REAL NOT NULL DEFAULT 0,"
+            " access_count INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(suggestions)")}
+        for column, definition in (("last_accessed", "REAL NOT NULL DEFAULT 0"),
+                                   ("access_count", "INTEGER NOT NULL DEFAULT 0")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE suggestions ADD COLUMN {column} {definition}")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_suggestions_generated_at ON suggestions (generated_at)"
+        )
+        self._conn.commit()
+
+    def load(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM suggestions WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+            if row:
+                self._conn.execute(
+                    "UPDATE suggestions SET last_accessed = ?, access_count = access_count + 1 "
+                    "WHERE cache_key = ?", (time.time(), cache_key)
+                )
+                self._conn.commit()
+        return decode_suggestion_record(row[0]) if row else None
+
+    def save(self, cache_key: str, data: Dict[str, Any]):
+        self.save_many([(cache_key, data)])
+
+    def save_many(self, records: List[Tuple[str, Dict[str, Any]]]):
+        """Insert or replace several records in one transaction"""
+        rows = []
+        for cache_key, data in records:
+            if self.binary:
+                payload = encode_suggestion_record(data)
+            else:
+                payload = json.dumps(data, separators=(',', ':'))
+            generated_at = datetime.fromisoformat(data['generated_at']).timestamp()
+            rows.append((cache_key, generated_at, len(payload), payload, time.time()))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO suggestions "
+                "(cache_key, generated_at, size, data, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def delete(self, cache_key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM suggestions WHERE cache_key = ?", (cache_key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM suggestions")
+            self._conn.commit()
+
+    def expire(self, cutoff: datetime, batch_size: Optional[int] = None) -> int:
+        """Delete records generated before cutoff, optionally in batches of batch_size"""
+        if batch_size is None:
+            with self._lock:
+                cursor = self._conn.execute(
+                    "DELETE FROM suggestions WHERE generated_at < ?", (cutoff.timestamp(),)
+                )
+                self._conn.commit()
+                return cursor.rowcount
+
+        removed = 0
+        while True:
+            # Release the lock between batches so lookups can interleave
+            with self._lock:
+                cursor = self._conn.execute(
+                    "DELETE FROM suggestions WHERE rowid IN ("
+                    " SELECT rowid FROM suggestions WHERE generated_at < ? LIMIT ?)",
+                    (cutoff.timestamp(), batch_size)
+                )
+                self._conn.commit()
+            removed += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                return removed
+
+    def evict(self, max_entries: Optional[int], max_bytes: Optional[int],
+              policy: str = "lru") -> int:
+        """Remove least recently (or least frequently) used records until under the caps"""
+        order = "access_count, last_accessed" if policy == "lfu" else "last_accessed"
+        with self._lock:
+            total_entries, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM suggestions"
+            ).fetchone()
+            if not _over_cache_limits(total_entries, total_bytes, max_entries, max_bytes):
+                return 0
+
+            victims = []
+            for cache_key, size in self._conn.execute(
+                    f"SELECT cache_key, size FROM suggestions ORDER BY {order}"):
+                if not _over_cache_limits(total_entries, total_bytes, max_entries, max_bytes):
+                    break
+                victims.append((cache_key,))
+                total_entries -= 1
+                total_bytes -= size
+
+            self._conn.executemany("DELETE FROM suggestions WHERE cache_key = ?", victims)
+            self._conn.commit()
+        return len(victims)
+
+    def stats(self) -> Tuple[int, int]:
+        with self._lock:
+            count, total_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM suggestions"
+            ).fetchone()
+        return count, total_size
+
+    def import_json_directory(self, cache_dir: Path, remove_source: bool = True) -> int:
+        """Migrate <key>.json and <key>.bin directory cache files into the database"""
+        records = []
+        migrated_files = []
+        for cache_file in itertools.chain.from_iterable(
+                cache_dir.glob(f"*{suffix}") for suffix in JSONDirectoryStore.SUFFIXES):
+            try:
+                data = decode_suggestion_record(cache_file.read_bytes())
+                datetime.fromisoformat(data['generated_at'])
+                records.append((cache_file.stem, data))
+                migrated_files.append(cache_file)
+            except Exception as e:
+                print(f"⚠️ Skipping unreadable cache file {cache_file.name}: {e}")
+
+        if records:
+            self.save_many(records)
+        if remove_source:
+            for cache_file in migrated_files:
+                cache_file.unlink()
+        return len(records)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class CopilotResponseParser:
+    """Incremental Copilot output parser, fed one line at a time
+    
+    Recognises the same sections and code blocks as a full parse. feed()
+    reports completion once the response has a suggestion, a closed code
+    block and an explanation paragraph ended by a blank line (unless
+    stop_early is False), or once max_bytes of output have been read.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, stop_early: bool = True):
+        self.max_bytes = max_bytes
+        self.stop_early = stop_early
+        self.bytes_read = 0
+        self.truncated = False
+        self.complete = False
+        self._section: Optional[str] = None
+        self._code_block = False
+        self._code_closed = False
+        self._suggestion: List[str] = []
+        self._code: List[str] = []
+        self._explanation: List[str] = []
+
+    def feed(self, line: str) -> bool:
+        """Consume one output line; returns True once no further output is needed"""
+        if self.complete or self.truncated:
+            return True
+        self.bytes_read += len(line.encode())
+        if self.max_bytes is not None and self.bytes_read > self.max_bytes:
+            self.truncated = True
+            return True
+        
+        line = line.strip()
+        
+        # Detect code blocks
+        if line.startswith('```'):
+            self._code_block = not self._code_block
+            if not self._code_block and any(self._code):
+                self._code_closed = True
+            return False
+        
+        # Detect sections
+        lowered = line.lower()
+        if lowered.startswith('explanation:') or 'why' in lowered:
+            self._section = 'explanation'
+        elif lowered.startswith('fix:') or 'secure' in lowered:
+            self._section = 'suggestion'
+        elif self._code_block:
+            self._code.append(line)
+        elif self._section == 'explanation':
+            if (self.stop_early and not line and any(self._explanation)
+                    and any(self._suggestion) and self._code_closed):
+                self.complete = True
+                return True
+            self._explanation.append(line)
+        else:
+            self._suggestion.append(line)
+        return False
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            'success': True,
+            'suggestion': ' '.join(self._suggestion).strip() or "Security fix required",
+            'code_example': '\n'.join(self._code).strip(),
+            'explanation': ' '.join(self._explanation).strip() or "This code contains a security vulnerability"
+        }
+
 class CopilotSuggestionEngine:
     """GitHub Copilot integration for security suggestions"""
     
-    def __init__(self, cache_dir: str = "copilot_cache"):
+    def __init__(self, cache_dir: str = "copilot_cache",
+                 memory_cache_entries: int = 1024,
+                 memory_cache_bytes: int = 16 * 1024 * 1024,
+                 cache_backend: str = "json",
+                 cache_key_mode: str = "issue",
+                 max_cache_entries: Optional[int] = None,
+                 max_cache_bytes: Optional[int] = None,
+                 eviction_policy: str = "lru",
+                 sweep_interval: Optional[float] = None,
+                 use_copilot: bool = True,
+                 availability_marker_ttl: Optional[timedelta] = None,
+                 fix_rules_file: Optional[str] = None,
+                 rules_file: Optional[str] = None,
+                 cache_format: str = "json",
+                 metrics_enabled: bool = False,
+                 metrics_sink: Optional[Callable[[str, float], None]] = None,
+                 copilot_max_concurrency: int = 16,
+                 circuit_breaker_threshold: int = 5,
+                 circuit_breaker_cool_down: float = 60.0,
+                 stream_copilot_output: bool = True,
+                 max_copilot_response_bytes: Optional[int] = 64 * 1024,
+                 cache_policies: Optional[Dict[str, CachePolicy]] = None):
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
         
-        # Cache settings
+        # Disk cache backend: "json" (one file per key) or "sqlite" (single indexed store);
+        # records are written as JSON or, with cache_format="binary", as compact binary
+        if cache_format not in ("json", "binary"):
+            raise ValueError(f"Unknown cache format: {cache_format}")
+        self.cache_format = cache_format
+        binary = cache_format == "binary"
+        if cache_backend == "sqlite":
+            self.disk_cache = SQLiteSuggestionStore(self.cache_dir / "suggestions.db", binary=binary)
+            migrated = self.disk_cache.import_json_directory(self.cache_dir)
+            if migrated:
+                print(f"✅ Migrated {migrated} cached suggestions to SQLite store")
+        elif cache_backend == "json":
+            self.disk_cache = JSONDirectoryStore(self.cache_dir, binary=binary)
+        else:
+            raise ValueError(f"Unknown cache backend: {cache_backend}")
+        self.cache_backend = cache_backend
+        
+        # Cache keying: "issue" (issue ID + snippet) or "normalized" (rule + matched code)
+        if cache_key_mode not in ("issue", "normalized"):
+            raise ValueError(f"Unknown cache key mode: {cache_key_mode}")
+        self.cache_key_mode = cache_key_mode
+        
+        # Cache settings; per-source policies decide persistence and TTL, sources
+        # without a policy are persisted for cache_duration
         self.cache_duration = timedelta(hours=24)
-        self.suggestion_cache = {}
+        self.cache_policies = {**DEFAULT_CACHE_POLICIES, **(cache_policies or {})}
+        self.suggestion_cache = SuggestionMemoryCache(memory_cache_entries, memory_cache_bytes)
+        
+        # Disk cache size caps and eviction
+        if eviction_policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown eviction policy: {eviction_policy}")
+        self.max_cache_entries = max_cache_entries
+        self.max_cache_bytes = max_cache_bytes
+        self.eviction_policy = eviction_policy
+        self.eviction_check_interval = 64
+        self._writes_since_eviction = 0
+        
+        # Per-tier cache hit/miss and eviction counters
+        self.cache_counters = {'memory_hits': 0, 'memory_misses': 0, 'disk_hits': 0, 'disk_misses': 0,
+                               'expired_entries': 0, 'evicted_entries': 0, 'sweeps': 0,
+                               'coalesced_requests': 0, 'promotions': 0, 'soft_misses': 0}
+        self._counters_lock = threading.Lock()
+        
+        # Keys of memory-only results built without a Copilot answer (unavailable,
+        # circuit open or deadline); only these are regenerated once Copilot is usable
+        self._refreshable_keys: set = set()
+        
+        # Optional background TTL sweeper
+        self._sweeper_thread: Optional[threading.Thread] = None
+        self._sweeper_stop = threading.Event()
+        
+        # Stage latency and Copilot outcome instrumentation (no-op unless enabled)
+        self.metrics = SuggestionMetrics(metrics_enabled, metrics_sink)
+        
+        # Identical in-flight suggestion requests are coalesced by cache key
+        self._inflight_requests = SingleFlight()
+        
+        # Bulk worker threads register their CopilotProcessGroup here
+        self._process_group = threading.local()
         
-        # Check Copilot availability
-        self.copilot_available = self._check_copilot_availability()
+        # Line-offset indexes of recently read source files, keyed by path
+        self.max_indexed_files = 64
+        self._line_index_cache: "OrderedDict[str, SourceLineIndex]" = OrderedDict()
+        self._line_index_lock = threading.Lock()
+        
+        # Copilot CLI timeouts (seconds); batched calls get extra time per packed issue
+        self.copilot_timeout = 45
+        self.copilot_batch_timeout_per_issue = 15
+        
+        # Concurrent gh calls adapt AIMD-style to latency and errors; repeated timeouts
+        # trip a circuit breaker that serves templates until a probe call succeeds
+        self.copilot_limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=min(4, copilot_max_concurrency), max_limit=copilot_max_concurrency,
+            latency_target=self.copilot_timeout / 3)
+        self.circuit_breaker = CircuitBreaker(circuit_breaker_threshold, circuit_breaker_cool_down)
+        
+        # Single-issue gh output is parsed while it streams; gh is stopped once the
+        # suggestion, code block and explanation are in or the size cap is reached
+        self.stream_copilot_output = stream_copilot_output
+        self.max_copilot_response_bytes = max_copilot_response_bytes
+        
+        # Copilot availability is probed lazily on first use and memoized per process
+        self.use_copilot = use_copilot
+        self.availability_marker_ttl = availability_marker_ttl
+        self._copilot_available_override: Optional[bool] = None
         
         # Security context database
-        self.security_contexts = self._load_security_contexts()
+        self.rule_registry = get_rule_registry(rules_file)
+        self.security_contexts = RuleRegistryView(self.rule_registry, 'security_context')
         
         # Automated fix patterns
-        self.fix_patterns = self._load_fix_patterns()
+        self.fix_rules_file = fix_rules_file
+        self._custom_fix_patterns: Optional[Dict[str, Dict[str, Any]]] = None
+        self._custom_fix_engine: Optional[FixRuleEngine] = None
         
         print(f"✅ Copilot Suggestion Engine initialized")
-        print(f"   • Copilot available: {self.copilot_available}")
+        print(f"   • Copilot enabled: {self.use_copilot} (availability checked on first use)")
         print(f"   • Cache directory: {self.cache_dir}")
+        
+        if sweep_interval:
+            self.start_cache_sweeper(sweep_interval)
+    
+    @property
+    def fix_patterns(self) -> Mapping[str, Mapping[str, Any]]:
+        """Fix patterns by rule_id, including rules from fix_rules_file"""
+        if not self.fix_rules_file:
+            return self.rule_registry.fix_patterns()
+        if self._custom_fix_patterns is None:
+            self._custom_fix_patterns = {**self.rule_registry.fix_patterns(),
+                                         **FixRuleEngine.load_rule_file(self.fix_rules_file)}
+        return self._custom_fix_patterns
+    
+    @property
+    def fix_engine(self) -> FixRuleEngine:
+        """Compiled fix rules; shared across engines unless fix_rules_file is set"""
+        if not self.fix_rules_file:
+            return self.rule_registry.fix_engine()
+        if self._custom_fix_engine is None:
+            self._custom_fix_engine = FixRuleEngine(self.fix_patterns)
+        return self._custom_fix_engine
+    
+    def _fix_pattern(self, rule_id: str) -> Optional[Mapping[str, Any]]:
+        """Fix pattern for one rule, loading only that rule's record from the registry"""
+        if self.fix_rules_file:
+            fix_pattern = self.fix_patterns.get(rule_id)
+        else:
+            record = self.rule_registry.get(rule_id)
+            fix_pattern = record.fix_pattern if record else None
+        if fix_pattern and 'pattern' in fix_pattern and 'replacement' in fix_pattern:
+            return fix_pattern
+        return None
+    
+    @property
+    def copilot_available(self) -> bool:
+        """Whether GitHub Copilot CLI can be used, probing it on first access"""
+        if self._copilot_available_override is not None:
+            return self._copilot_available_override
+        if not self.use_copilot:
+            return False
+        
+        global _copilot_probe_result
+        if _copilot_probe_result is None:
+            with _copilot_probe_lock:
+                if _copilot_probe_result is None:
+                    _copilot_probe_result = self._probe_copilot_availability()
+        return _copilot_probe_result
+    
+    @copilot_available.setter
+    def copilot_available(self, value: bool):
+        self._copilot_available_override = value
+    
+    def _probe_copilot_availability(self) -> bool:
+        """Run the availability check, reusing a fresh on-disk marker when configured"""
+        if self.availability_marker_ttl is None:
+            return self._check_copilot_availability()
+        
+        marker_file = self.cache_dir / ".copilot_availability"
+        try:
+            with open(marker_file, 'r') as f:
+                marker = json.load(f)
+            checked_at = datetime.fromisoformat(marker['checked_at'])
+            if datetime.now() - checked_at < self.availability_marker_ttl:
+                return bool(marker['available'])
+        except (FileNotFoundError, KeyError, ValueError):
+            pass
+        
+        available = self._check_copilot_availability()
+        try:
+            with open(marker_file, 'w') as f:
+                json.dump({'available': available, 'checked_at': datetime.now().isoformat()}, f)
+        except OSError as e:
+            print(f"⚠️ Could not write Copilot availability marker: {e}")
+        return available
     
     def _check_copilot_availability(self) -> bool:
         """Check if GitHub Copilot CLI is available"""
@@ -87,146 +1651,80 @@ class CopilotSuggestionEngine:
             print("❌ GitHub CLI not available or timed out")
             return False
     
-    def _load_security_contexts(self) -> Dict[str, SecurityContext]:
-        """Load security contexts for different vulnerability types"""
-        return {
-            'python-hardcoded-secrets': SecurityContext(
-                threat_description="Hardcoded secrets can be extracted from source code, leading to unauthorized access",
-                impact_level="CRITICAL",
-                compliance_standards=["OWASP A02:2021", "PCI DSS 3.4", "ISO 27001"],
-                recommended_tools=["python-decouple", "python-dotenv", "HashiCorp Vault", "AWS Secrets Manager"],
-                prevention_tips=[
-                    "Use environment variables for sensitive data",
-                    "Implement secret management systems",
-                    "Use configuration files outside source control",
-                    "Implement secret scanning in CI/CD pipelines"
-                ]
-            ),
-            'python-sql-injection': SecurityContext(
-                threat_description="SQL injection allows attackers to manipulate database queries and access sensitive data",
-                impact_level="CRITICAL",
-                compliance_standards=["OWASP A03:2021", "ISO 27001", "PCI DSS 6.5.1"],
-                recommended_tools=["SQLAlchemy", "Django ORM", "psycopg2", "PyMySQL"],
-                prevention_tips=[
-                    "Always use parameterized queries",
-                    "Implement input validation and sanitization",
-                    "Use ORM frameworks when possible",
-                    "Apply principle of least privilege for database access"
-                ]
-            ),
-            'javascript-eval-usage': SecurityContext(
-                threat_description="eval() executes arbitrary JavaScript code, enabling code injection attacks",
-                impact_level="HIGH",
-                compliance_standards=["OWASP A03:2021", "CSP Level 3"],
-                recommended_tools=["JSON.parse", "Function constructor", "safe-eval library"],
-                prevention_tips=[
-                    "Use JSON.parse() for parsing JSON data",
-                    "Use Function constructor for dynamic functions",
-                    "Implement Content Security Policy",
-                    "Validate and sanitize all user input"
-                ]
-            ),
-            'python-weak-crypto': SecurityContext(
-                threat_description="Weak cryptographic algorithms can be broken, compromising data confidentiality",
-                impact_level="HIGH",
-                compliance_standards=["OWASP A02:2021", "FIPS 140-2", "Common Criteria"],
-                recommended_tools=["hashlib", "cryptography", "PyNaCl", "bcrypt"],
-                prevention_tips=[
-                    "Use SHA-256 or stronger hashing algorithms",
-                    "Implement proper key management",
-                    "Use established cryptographic libraries",
-                    "Regular security audits of cryptographic implementations"
-                ]
-            ),
-            'cross-lang-time-bomb': SecurityContext(
-                threat_description="Time-based logic bombs can cause system disruption at predetermined times",
-                impact_level="HIGH",
-                compliance_standards=["ISO 27001", "NIST Cybersecurity Framework"],
-                recommended_tools=["cron", "celery", "APScheduler", "cloud schedulers"],
-                prevention_tips=[
-                    "Use proper scheduling systems instead of hardcoded dates",
-                    "Implement code review processes",
-                    "Use static analysis tools to detect suspicious patterns",
-                    "Implement logging and monitoring for time-based operations"
-                ]
-            )
-        }
-    
-    def _load_fix_patterns(self) -> Dict[str, Dict[str, Any]]:
-        """Load automated fix patterns for common vulnerabilities"""
-        return {
-            'python-hardcoded-secrets': {
-                'pattern': r'(password|secret|key|token|api_key)\s*=\s*["\']([^"\']+)["\']',
-                'replacement': r'\1 = os.getenv("\1".upper(), "\2")',
-                'imports': ['import os'],
-                'confidence': 'high',
-                'description': 'Replace hardcoded secrets with environment variables'
-            },
-            'python-sql-injection': {
-                'pattern': r'execute\s*\(\s*["\'](.*)%s(.*)["\']',
-                'replacement': r'execute("\1%s\2", (param,))',
-                'imports': [],
-                'confidence': 'medium',
-                'description': 'Convert to parameterized query'
-            },
-            'javascript-eval-usage': {
-                'pattern': r'eval\s*\(\s*([^)]+)\s*\)',
-                'replacement': r'JSON.parse(\1)',
-                'imports': [],
-                'confidence': 'medium',
-                'description': 'Replace eval with JSON.parse for data parsing'
-            },
-            'python-weak-crypto': {
-                'pattern': r'(hashlib\.md5|hashlib\.sha1)\s*\(',
-                'replacement': r'hashlib.sha256(',
-                'imports': ['import hashlib'],
-                'confidence': 'high',
-                'description': 'Replace weak hash algorithm with SHA-256'
-            }
-        }
-    
+    @_timed_stage('total')
     def generate_security_suggestion(self, issue, code_snippet: str, 
                                    file_context: str = None) -> CopilotSuggestion:
         """Generate comprehensive security suggestion using Copilot"""
         
         # Check cache first
-        cache_key = self._generate_cache_key(issue.id, code_snippet)
-        cached_suggestion = self._get_cached_suggestion(cache_key)
+        cache_key = self._suggestion_cache_key(issue, code_snippet)
+        cached_suggestion = self._lookup_cached_suggestion(issue, code_snippet, cache_key)
         if cached_suggestion:
             return cached_suggestion
         
-        # Generate new suggestion
-        suggestion = self._generate_new_suggestion(issue, code_snippet, file_context)
+        # Generate new suggestion; concurrent callers with the same key share one generation
+        def generate():
+            # A flight for this key may have completed since our cache lookup
+            suggestion = self.suggestion_cache.get(cache_key)
+            if suggestion is None or self._should_refresh(cache_key, suggestion):
+                suggestion, copilot_skipped = self._generate_new_suggestion(issue, code_snippet, file_context)
+                
+                # Cache the result
+                self._cache_suggestion(cache_key, suggestion, refreshable=copilot_skipped)
+            return suggestion
+        
+        suggestion, shared = self._inflight_requests.do(cache_key, generate)
+        if shared:
+            with self._counters_lock:
+                self.cache_counters['coalesced_requests'] += 1
         
-        # Cache the result
-        self._cache_suggestion(cache_key, suggestion)
+        # Shared results and memory hits may belong to another issue with the same key
+        if suggestion.issue_id != issue.id:
+            suggestion = replace(suggestion, issue_id=issue.id)
         
         return suggestion
     
     def _generate_new_suggestion(self, issue, code_snippet: str, 
-                               file_context: str = None) -> CopilotSuggestion:
-        """Generate a new suggestion using Copilot"""
+                               file_context: str = None) -> Tuple[CopilotSuggestion, bool]:
+        """Generate a new suggestion using Copilot
         
-        suggestion_text = ""
-        code_example = ""
-        explanation = ""
-        confidence = "medium"
-        source = "template"
+        Returns the suggestion and whether Copilot was skipped (see _copilot_skipped).
+        """
+        
+        copilot_result = None
         
         # Try Copilot first if available
         if self.copilot_available:
             try:
                 copilot_result = self._query_copilot(issue, code_snippet, file_context)
-                if copilot_result['success']:
-                    suggestion_text = copilot_result['suggestion']
-                    code_example = copilot_result['code_example']
-                    explanation = copilot_result['explanation']
-                    confidence = "high"
-                    source = "github_copilot"
-                    
             except Exception as e:
                 print(f"⚠️ Copilot query failed: {e}")
         
+        return (self._build_suggestion(issue, code_snippet, copilot_result),
+                self._copilot_skipped(copilot_result))
+    
+    @staticmethod
+    def _copilot_skipped(copilot_result: Optional[Dict[str, Any]]) -> bool:
+        """Whether a result came without gh answering: unavailable, circuit open or deadline"""
+        return copilot_result is None or bool(copilot_result.get('skipped'))
+    
+    def _build_suggestion(self, issue, code_snippet: str,
+                          copilot_result: Optional[Dict[str, Any]]) -> CopilotSuggestion:
+        """Assemble a suggestion from a Copilot result, falling back to templates"""
+        
+        suggestion_text = ""
+        code_example = ""
+        explanation = ""
+        confidence = "medium"
+        source = "template"
+        
+        if copilot_result and copilot_result['success']:
+            suggestion_text = copilot_result['suggestion']
+            code_example = copilot_result['code_example']
+            explanation = copilot_result['explanation']
+            confidence = "high"
+            source = "github_copilot"
+        
         # Fallback to template-based suggestion
         if not suggestion_text:
             template_result = self._generate_template_suggestion(issue, code_snippet)
@@ -235,8 +1733,8 @@ class CopilotSuggestionEngine:
             explanation = template_result['explanation']
         
         # Check for automated fix availability
-        fix_pattern = self.fix_patterns.get(issue.rule_id)
-        automated_fix_available = fix_pattern is not None
+        fix_rule = self._fix_pattern(issue.rule_id)
+        automated_fix_available = fix_rule is not None
         
         return CopilotSuggestion(
             issue_id=issue.id,
@@ -247,8 +1745,8 @@ class CopilotSuggestionEngine:
             source=source,
             generated_at=datetime.now().isoformat(),
             automated_fix_available=automated_fix_available,
-            fix_pattern=fix_pattern.get('pattern') if fix_pattern else None,
-            replacement_pattern=fix_pattern.get('replacement') if fix_pattern else None
+            fix_pattern=fix_rule['pattern'] if fix_rule else None,
+            replacement_pattern=fix_rule['replacement'] if fix_rule else None
         )
     
     def _query_copilot(self, issue, code_snippet: str, 
@@ -257,34 +1755,284 @@ class CopilotSuggestionEngine:
         
         # Create a structured prompt for Copilot
         prompt = self._create_copilot_prompt(issue, code_snippet, file_context)
-        
-        # Create temporary file with the prompt
-        temp_file = self._create_temp_file(prompt, issue.file_path)
+        parser = CopilotResponseParser(self.max_copilot_response_bytes) if self.stream_copilot_output else None
         
         try:
             # Use GitHub Copilot CLI to get suggestions
-            result = subprocess.run([
+            result = self._run_copilot_command([
                 'gh', 'copilot', 'suggest', 
                 '--type', 'gh',
                 f'Fix this security vulnerability: {issue.message}'
-            ], input=prompt, capture_output=True, text=True, timeout=45)
+            ], prompt, self.copilot_timeout, parser, stage='copilot_query')
             
+            if result is None:
+                return {'success': False, 'skipped': True}
             if result.returncode == 0:
-                return self._parse_copilot_response(result.stdout)
+                self.metrics.count('copilot_success')
+                if parser is None:
+                    return self._parse_copilot_response(result.stdout)
+                if parser.complete:
+                    self.metrics.count('copilot_early_stops')
+                elif parser.truncated:
+                    self.metrics.count('copilot_truncated_responses')
+                return parser.result()
             else:
+                self.metrics.count('copilot_failure')
                 print(f"⚠️ Copilot command failed: {result.stderr}")
                 return {'success': False}
                 
         except subprocess.TimeoutExpired:
+            self.metrics.count('copilot_timeout')
             print("⚠️ Copilot query timed out")
             return {'success': False}
         except Exception as e:
+            self.metrics.count('copilot_failure')
             print(f"⚠️ Copilot query error: {e}")
             return {'success': False}
+    
+    def _run_copilot_command(self, args: List[str], prompt: str, timeout: float,
+                             parser: Optional[CopilotResponseParser] = None,
+                             stage: str = 'copilot_query') -> Optional[subprocess.CompletedProcess]:
+        """Run a gh command under the adaptive concurrency limit and circuit breaker
+        
+        With a parser, stdout is streamed into it instead of being captured.
+        Time spent waiting for a limiter slot is recorded as 'copilot_queue',
+        the gh subprocess itself as stage.
+        Returns None without running gh while the circuit is open, and None
+        for a call killed because its bulk run reached its deadline.
+        """
+        if not self.circuit_breaker.allow_request(claim_probe=False):
+            self.metrics.count('copilot_short_circuited')
+            return None
+        
+        with self.metrics.stage('copilot_queue'):
+            started = self.copilot_limiter.acquire()
+        # The circuit may have opened while this call waited for a slot
+        if not self.circuit_breaker.allow_request():
+            self.copilot_limiter.release(started)
+            self.metrics.count('copilot_short_circuited')
+            return None
+        # Only the single half-open probe is let through a non-closed circuit
+        probe = self.circuit_breaker.state == "half_open"
+        
+        group = getattr(self._process_group, 'current', None)
+        success = False
+        timed_out = False
+        abandoned = False
+        try:
+            with self.metrics.stage(stage):
+                if parser is None:
+                    result = self._communicate_copilot_command(args, prompt, timeout, group)
+                else:
+                    result = self._stream_copilot_command(args, prompt, timeout, parser, group)
+            success = result.returncode == 0
+            # A call killed at a bulk deadline says nothing about Copilot's health
+            abandoned = not success and group is not None and group.cancelled
+            return None if abandoned else result
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            raise
+        finally:
+            self.copilot_limiter.release(started, None if abandoned else success)
+            if not abandoned:
+                self._record_copilot_outcome(success, timed_out)
+            elif probe:
+                # Otherwise the circuit would stay half-open with its probe never returned
+                self.circuit_breaker.release_probe()
+    
+    def _communicate_copilot_command(self, args: List[str], prompt: str, timeout: float,
+                                     group: Optional[CopilotProcessGroup] = None
+                                     ) -> subprocess.CompletedProcess:
+        """Run gh to completion like subprocess.run, tracking the process in group"""
+        process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE, text=True)
+        if group is not None:
+            group.add(process)
+        try:
+            stdout, stderr = process.communicate(prompt, timeout=timeout)
+        except BaseException:
+            process.kill()
+            process.communicate()
+            raise
         finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file):
-                os.unlink(temp_file)
+            if group is not None:
+                group.discard(process)
+        return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+    
+    def _stream_copilot_command(self, args: List[str], prompt: str, timeout: float,
+                                parser: CopilotResponseParser,
+                                group: Optional[CopilotProcessGroup] = None) -> subprocess.CompletedProcess:
+        """Run gh feeding stdout to parser line by line, killing it once parser has enough
+        
+        A process stopped early reports returncode 0; stdout is not retained.
+        """
+        process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        if group is not None:
+            group.add(process)
+        timed_out = threading.Event()
+        stderr_chunks: List[bytes] = []
+        
+        def kill_on_timeout():
+            timed_out.set()
+            process.kill()
+        
+        def write_prompt():
+            try:
+                process.stdin.write(prompt.encode())
+                process.stdin.close()
+            except OSError:
+                pass
+        
+        watchdog = threading.Timer(timeout, kill_on_timeout)
+        helpers = [threading.Thread(target=write_prompt, daemon=True),
+                   threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)]
+        watchdog.start()
+        for helper in helpers:
+            helper.start()
+        
+        stopped_early = False
+        try:
+            for raw_line in process.stdout:
+                if parser.feed(raw_line.decode(errors='replace')):
+                    stopped_early = True
+                    process.kill()
+                    break
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            watchdog.cancel()
+            process.stdout.close()
+            returncode = process.wait()
+            if group is not None:
+                group.discard(process)
+            for helper in helpers:
+                helper.join(timeout=1)
+        
+        if timed_out.is_set() and not stopped_early:
+            raise subprocess.TimeoutExpired(args, timeout)
+        return subprocess.CompletedProcess(args, 0 if stopped_early else returncode, '',
+                                           b''.join(stderr_chunks).decode(errors='replace'))
+    
+    def _record_copilot_outcome(self, success: bool, timed_out: bool):
+        """Feed a gh call outcome to the circuit breaker"""
+        if success:
+            self.circuit_breaker.record_success()
+        elif self.circuit_breaker.record_failure(timed_out):
+            print(f"⚠️ Copilot circuit opened; using templates for {self.circuit_breaker.cool_down:.0f}s")
+    
+    async def _query_copilot_async(self, issue, code_snippet: str,
+                                   file_context: str = None) -> Dict[str, Any]:
+        """Async variant of _query_copilot built on an asyncio subprocess"""
+        
+        prompt = self._create_copilot_prompt(issue, code_snippet, file_context)
+        
+        if not self.circuit_breaker.allow_request():
+            self.metrics.count('copilot_short_circuited')
+            return {'success': False, 'skipped': True}
+        
+        try:
+            process = await asyncio.create_subprocess_exec(
+                'gh', 'copilot', 'suggest',
+                '--type', 'gh',
+                f'Fix this security vulnerability: {issue.message}',
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except Exception as e:
+            self._record_copilot_outcome(False, False)
+            self.metrics.count('copilot_failure')
+            print(f"⚠️ Copilot query error: {e}")
+            return {'success': False}
+        
+        try:
+            with self.metrics.stage('copilot_query'):
+                stdout, stderr = await asyncio.wait_for(
+                    process.communicate(prompt.encode()), timeout=self.copilot_timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            self._record_copilot_outcome(False, True)
+            self.metrics.count('copilot_timeout')
+            print("⚠️ Copilot query timed out")
+            return {'success': False}
+        except asyncio.CancelledError:
+            # Do not leave gh processes behind when the caller cancels
+            process.kill()
+            await process.wait()
+            self._record_copilot_outcome(False, False)
+            raise
+        
+        self._record_copilot_outcome(process.returncode == 0, False)
+        if process.returncode == 0:
+            self.metrics.count('copilot_success')
+            return self._parse_copilot_response(stdout.decode(errors='replace'))
+        self.metrics.count('copilot_failure')
+        print(f"⚠️ Copilot command failed: {stderr.decode(errors='replace')}")
+        return {'success': False}
+    
+    def _query_copilot_batch(self, issue_data: List[Tuple[Any, str]]) -> Dict[str, Dict[str, Any]]:
+        """Query Copilot once for several issues, falling back to per-issue calls
+        
+        Returns a Copilot result dict per issue ID.
+        """
+        if len(issue_data) == 1:
+            issue, code_snippet = issue_data[0]
+            return {issue.id: self._query_copilot(issue, code_snippet)}
+        
+        prompt = self._create_batch_copilot_prompt(issue_data)
+        issue_ids = [issue.id for issue, _ in issue_data]
+        results: Dict[str, Dict[str, Any]] = {}
+        
+        try:
+            result = self._run_copilot_command([
+                'gh', 'copilot', 'suggest',
+                '--type', 'gh',
+                f'Fix these {len(issue_data)} security vulnerabilities'
+            ], prompt, self.copilot_timeout + self.copilot_batch_timeout_per_issue * (len(issue_data) - 1),
+                stage='copilot_batch_query')
+            
+            if result is None:
+                # Circuit open or deadline reached: skip the per-issue fallback calls as well
+                return {issue_id: {'success': False, 'skipped': True} for issue_id in issue_ids}
+            if result.returncode == 0:
+                self.metrics.count('copilot_success')
+                results = self._parse_batched_copilot_response(result.stdout, issue_ids)
+            else:
+                self.metrics.count('copilot_failure')
+                print(f"⚠️ Copilot batch command failed: {result.stderr}")
+                
+        except subprocess.TimeoutExpired:
+            self.metrics.count('copilot_timeout')
+            print("⚠️ Copilot batch query timed out")
+        except Exception as e:
+            self.metrics.count('copilot_failure')
+            print(f"⚠️ Copilot batch query error: {e}")
+        
+        # Issues whose section could not be split out are queried individually
+        for issue, code_snippet in issue_data:
+            if issue.id not in results:
+                results[issue.id] = self._query_copilot(issue, code_snippet)
+        
+        return results
+    
+    def _create_batch_copilot_prompt(self, issue_data: List[Tuple[Any, str]]) -> str:
+        """Pack several issue prompts into one request with per-issue delimiters"""
+        
+        sections = [
+            "# Batched Security Vulnerability Fix Request",
+            "",
+            "Answer every issue below separately. Wrap each answer in the exact markers",
+            f"`{BATCH_BEGIN_MARKER} <issue id>` and `{BATCH_END_MARKER} <issue id>` on their own lines.",
+        ]
+        for issue, code_snippet in issue_data:
+            sections.append(f"\n{BATCH_BEGIN_MARKER} {issue.id}")
+            sections.append(self._create_copilot_prompt(issue, code_snippet).strip())
+            sections.append(f"{BATCH_END_MARKER} {issue.id}")
+        
+        return '\n'.join(sections) + '\n'
     
     def _create_copilot_prompt(self, issue, code_snippet: str, 
                               file_context: str = None) -> str:
@@ -323,179 +2071,213 @@ Focus on practical, production-ready security fixes.
         
         return prompt
     
-    def _create_temp_file(self, content: str, original_file: str) -> str:
-        """Create a temporary file with the prompt content"""
-        
-        file_ext = self._get_file_extension(original_file)
-        
-        with tempfile.NamedTemporaryFile(mode='w', suffix=file_ext, delete=False) as f:
-            f.write(content)
-            return f.name
-    
     def _get_file_extension(self, file_path: str) -> str:
         """Get file extension for syntax highlighting"""
         ext = Path(file_path).suffix
         return ext if ext else '.txt'
     
+    @_timed_stage('parse')
     def _parse_copilot_response(self, response: str) -> Dict[str, Any]:
         """Parse Copilot response and extract components"""
         
-        lines = response.strip().split('\n')
-        
-        # Extract different sections
-        suggestion = ""
-        code_example = ""
-        explanation = ""
-        
-        current_section = None
-        code_block = False
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Detect code blocks
-            if line.startswith('```'):
-                code_block = not code_block
-                continue
-                
-            # Detect sections
-            if line.lower().startswith('explanation:') or 'why' in line.lower():
-                current_section = 'explanation'
-                continue
-            elif line.lower().startswith('fix:') or 'secure' in line.lower():
-                current_section = 'suggestion'
-                continue
-            elif code_block:
-                code_example += line + '\n'
-                continue
-            
-            # Add content to appropriate section
-            if current_section == 'explanation':
-                explanation += line + ' '
-            elif current_section == 'suggestion':
-                suggestion += line + ' '
-            else:
-                suggestion += line + ' '
+        parser = CopilotResponseParser(stop_early=False)
+        for line in response.strip().split('\n'):
+            parser.feed(line)
+        return parser.result()
+    
+    def _parse_batched_copilot_response(self, response: str,
+                                        issue_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Split a batched Copilot response per issue ID and parse each section
         
-        return {
-            'success': True,
-            'suggestion': suggestion.strip() or "Security fix required",
-            'code_example': code_example.strip(),
-            'explanation': explanation.strip() or "This code contains a security vulnerability"
-        }
+        Issues without a complete BEGIN/END section are left out of the result.
+        """
+        results = {}
+        for issue_id in issue_ids:
+            marker_id = re.escape(issue_id)
+            match = re.search(
+                rf'^\s*{re.escape(BATCH_BEGIN_MARKER)}\s+{marker_id}\s*$(.*?)'
+                rf'^\s*{re.escape(BATCH_END_MARKER)}\s+{marker_id}\s*$',
+                response, re.MULTILINE | re.DOTALL
+            )
+            if match and match.group(1).strip():
+                results[issue_id] = self._parse_copilot_response(match.group(1))
+        return results
     
+    @_timed_stage('template')
     def _generate_template_suggestion(self, issue, code_snippet: str) -> Dict[str, Any]:
         """Generate template-based suggestion as fallback"""
         
-        templates = {
-            'python-hardcoded-secrets': {
-                'suggestion': 'Replace hardcoded secrets with environment variables or secure configuration management',
-                'code_example': '''import os
-from decouple import config
-
-# Instead of hardcoded secrets:
-# SECRET_KEY = "hardcoded_secret_value"
-
-# Use environment variables:
-SECRET_KEY = os.getenv("SECRET_KEY")
-# Or use python-decouple:
-SECRET_KEY = config("SECRET_KEY")''',
-                'explanation': 'Hardcoded secrets in source code can be easily discovered by attackers. Use environment variables or secure configuration management systems.'
-            },
-            'python-sql-injection': {
-                'suggestion': 'Use parameterized queries or ORM methods to prevent SQL injection attacks',
-                'code_example': '''import sqlite3
-
-# Vulnerable code:
-# cursor.execute("SELECT * FROM users WHERE name = '%s'" % user_input)
-
-# Secure code using parameterized queries:
-cursor.execute("SELECT * FROM users WHERE name = ?", (user_input,))
-
-# Or using named parameters:
-cursor.execute("SELECT * FROM users WHERE name = :name", {"name": user_input})''',
-                'explanation': 'SQL injection occurs when user input is directly concatenated into SQL queries. Always use parameterized queries to separate SQL code from data.'
-            },
-            'javascript-eval-usage': {
-                'suggestion': 'Replace eval() with safer alternatives like JSON.parse() or Function constructor',
-                'code_example': '''// Vulnerable code:
-// eval(userInput);
-
-// For JSON parsing:
-const data = JSON.parse(jsonString);
-
-// For dynamic functions (use with caution):
-const func = new Function('param', 'return param * 2');
-
-// For mathematical expressions, use a math library:
-const result = math.evaluate(expression);''',
-                'explanation': 'eval() executes arbitrary JavaScript code, making it vulnerable to code injection attacks. Use specific parsers or safer alternatives.'
-            },
-            'python-weak-crypto': {
-                'suggestion': 'Replace weak cryptographic algorithms with stronger alternatives',
-                'code_example': '''import hashlib
-import bcrypt
-
-# Instead of weak algorithms:
-# hash_value = hashlib.md5(data).hexdigest()
-# hash_value = hashlib.sha1(data).hexdigest()
-
-# Use stronger algorithms:
-hash_value = hashlib.sha256(data).hexdigest()
-hash_value = hashlib.sha3_256(data).hexdigest()
-
-# For password hashing, use bcrypt:
-password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())''',
-                'explanation': 'MD5 and SHA-1 are cryptographically weak and vulnerable to collision attacks. Use SHA-256 or stronger algorithms.'
-            }
-        }
+        rule = self.rule_registry.get(issue.rule_id)
+        return rule.template if rule and rule.template else DEFAULT_TEMPLATE
+    
+    @_timed_stage('cache_lookup')
+    def _lookup_cached_suggestion(self, issue, code_snippet: str,
+                                  cache_key: str) -> Optional[CopilotSuggestion]:
+        """Look up a suggestion in the memory tier, then the disk tier"""
+        cached_suggestion = self.suggestion_cache.get(cache_key)
+        self._count_cache_lookup('memory', cached_suggestion is not None)
         
-        template = templates.get(issue.rule_id, {
-            'suggestion': 'Review and fix this security vulnerability according to security best practices',
-            'code_example': '// Implement secure coding practices\n// Follow OWASP guidelines',
-            'explanation': 'This code contains a security vulnerability that should be addressed according to security best practices.'
-        })
+        if cached_suggestion is None:
+            cached_suggestion = self._get_cached_suggestion(cache_key)
+            legacy_key = self._generate_cache_key(issue.id, code_snippet)
+            if cached_suggestion is None and cache_key != legacy_key:
+                # Entries written under the v1 (issue ID) scheme stay readable
+                cached_suggestion = self._get_cached_suggestion(legacy_key)
+                if cached_suggestion:
+                    self._cache_suggestion(cache_key, cached_suggestion)
+            self._count_cache_lookup('disk', cached_suggestion is not None)
+            if cached_suggestion:
+                self.suggestion_cache.put(cache_key, cached_suggestion,
+                                          self._expiry_timestamp(cached_suggestion))
         
-        return template
+        if cached_suggestion and self._should_refresh(cache_key, cached_suggestion):
+            # Soft miss: regenerate so a Copilot answer can replace the template
+            with self._counters_lock:
+                self.cache_counters['soft_misses'] += 1
+            return None
+        
+        if cached_suggestion and cached_suggestion.issue_id != issue.id:
+            # Normalized keys are shared across issues
+            cached_suggestion = replace(cached_suggestion, issue_id=issue.id)
+        return cached_suggestion
+    
+    def _should_refresh(self, cache_key: str, suggestion: CopilotSuggestion) -> bool:
+        """Whether a cached memory-only result (e.g. a template) should be regenerated
+        
+        Only results built without asking gh (Copilot unavailable, circuit open
+        or bulk deadline) qualify, and only while Copilot is available and its
+        circuit is not open, so they are promoted once Copilot recovers. A
+        template left by a failed gh call is served until it expires.
+        """
+        with self._counters_lock:
+            refreshable = cache_key in self._refreshable_keys
+        return (refreshable
+                and not self._cache_policy(suggestion.source).persist
+                and self.circuit_breaker.state != "open"
+                and self.copilot_available)
+    
+    def _suggestion_cache_key(self, issue, code_snippet: str) -> str:
+        """Cache key for an issue according to the configured keying mode"""
+        if self.cache_key_mode == "normalized":
+            return self._generate_normalized_cache_key(issue, code_snippet)
+        return self._generate_cache_key(issue.id, code_snippet)
     
     def _generate_cache_key(self, issue_id: str, code_snippet: str) -> str:
         """Generate cache key for suggestion"""
         content = f"{issue_id}:{code_snippet}"
         return hashlib.md5(content.encode()).hexdigest()
     
+    def _generate_normalized_cache_key(self, issue, code_snippet: str,
+                                       context_lines: int = 5) -> str:
+        """Generate a position-independent cache key from rule and matched code
+        
+        The key covers the rule ID, the language and the matched line with
+        comments and whitespace removed, so identical vulnerable code shares
+        one entry across issues, files and rescans.
+        """
+        language = self._get_file_extension(issue.file_path)
+        lines = code_snippet.splitlines()
+        
+        # _get_code_snippet places the matched line after up to context_lines lines
+        match_index = min(max(issue.line_number - 1, 0), context_lines)
+        if match_index < len(lines) and self._normalize_code_line(lines[match_index], language):
+            matched_code = self._normalize_code_line(lines[match_index], language)
+        else:
+            matched_code = ''.join(self._normalize_code_line(line, language) for line in lines)
+        
+        content = f"{CACHE_KEY_VERSION}:{issue.rule_id}:{language}:{matched_code}"
+        return f"{CACHE_KEY_VERSION}-{hashlib.md5(content.encode()).hexdigest()}"
+    
+    def _normalize_code_line(self, line: str, language: str) -> str:
+        """Strip comments and all whitespace from a line of code"""
+        comment_pattern = LINE_COMMENT_PATTERNS.get(language.lower(), LINE_COMMENT_PATTERNS['.py'])
+        without_comments = comment_pattern.sub(lambda m: m.group(1) or '', line)
+        return re.sub(r'\s+', '', without_comments)
+    
     def _get_cached_suggestion(self, cache_key: str) -> Optional[CopilotSuggestion]:
         """Get cached suggestion if available and not expired"""
-        cache_file = self.cache_dir / f"{cache_key}.json"
-        
-        if cache_file.exists():
-            try:
-                with open(cache_file, 'r') as f:
-                    data = json.load(f)
+        try:
+            data = self.disk_cache.load(cache_key)
+            if data is None:
+                return None
+            
+            # Check if cache is still valid
+            generated_at = datetime.fromisoformat(data['generated_at'])
+            if datetime.now() - generated_at < self._cache_ttl(data.get('source')):
+                return CopilotSuggestion(**data)
+            else:
+                # Remove expired cache
+                self.disk_cache.delete(cache_key)
                 
-                # Check if cache is still valid
-                generated_at = datetime.fromisoformat(data['generated_at'])
-                if datetime.now() - generated_at < self.cache_duration:
-                    return CopilotSuggestion(**data)
-                else:
-                    # Remove expired cache
-                    cache_file.unlink()
-                    
-            except Exception as e:
-                print(f"⚠️ Cache read error: {e}")
-                # Remove corrupted cache
-                cache_file.unlink()
+        except Exception as e:
+            print(f"⚠️ Cache read error: {e}")
+            # Remove corrupted cache
+            self.disk_cache.delete(cache_key)
         
         return None
     
-    def _cache_suggestion(self, cache_key: str, suggestion: CopilotSuggestion):
-        """Cache suggestion to disk"""
-        cache_file = self.cache_dir / f"{cache_key}.json"
+    def _count_cache_lookup(self, tier: str, hit: bool):
+        """Record a hit or miss for the given cache tier"""
+        with self._counters_lock:
+            self.cache_counters[f"{tier}_{'hits' if hit else 'misses'}"] += 1
+    
+    def _cache_policy(self, source: Optional[str]) -> CachePolicy:
+        """Cache policy for suggestions from the given source"""
+        return self.cache_policies.get(source) or CachePolicy(persist=True)
+    
+    def _cache_ttl(self, source: Optional[str]) -> timedelta:
+        return self._cache_policy(source).ttl or self.cache_duration
+    
+    def _expiry_timestamp(self, suggestion: CopilotSuggestion) -> float:
+        """Epoch time at which a suggestion falls out of its source's TTL"""
+        try:
+            generated_at = datetime.fromisoformat(suggestion.generated_at)
+        except (TypeError, ValueError):
+            generated_at = datetime.now()
+        return (generated_at + self._cache_ttl(suggestion.source)).timestamp()
+    
+    @_timed_stage('cache_write')
+    def _cache_suggestion(self, cache_key: str, suggestion: CopilotSuggestion,
+                          refreshable: bool = False):
+        """Cache suggestion in memory and, if its source's policy persists, on disk
+        
+        A memory-only result never replaces a cached persisted answer; a persisted
+        answer replacing a memory-only entry (e.g. a template) is a promotion.
+        refreshable marks a memory-only result built without asking gh.
+        """
+        policy = self._cache_policy(suggestion.source)
+        with self._counters_lock:
+            if refreshable and not policy.persist:
+                self._refreshable_keys.add(cache_key)
+            else:
+                self._refreshable_keys.discard(cache_key)
+        current = self.suggestion_cache.get(cache_key)
+        if current is not None and current.source != suggestion.source:
+            if self._cache_policy(current.source).persist and not policy.persist:
+                return
+            if policy.persist and not self._cache_policy(current.source).persist:
+                with self._counters_lock:
+                    self.cache_counters['promotions'] += 1
+        
+        self.suggestion_cache.put(cache_key, suggestion, self._expiry_timestamp(suggestion))
+        if not policy.persist:
+            return
         
         try:
-            with open(cache_file, 'w') as f:
-                json.dump(asdict(suggestion), f, indent=2)
+            self.disk_cache.save(cache_key, asdict(suggestion))
         except Exception as e:
             print(f"⚠️ Cache write error: {e}")
+            return
+        
+        # Without a sweeper, enforce the size caps every few writes
+        if self._sweeper_thread is None and (self.max_cache_entries or self.max_cache_bytes):
+            with self._counters_lock:
+                self._writes_since_eviction += 1
+                due = self._writes_since_eviction >= self.eviction_check_interval
+                if due:
+                    self._writes_since_eviction = 0
+            if due:
+                self.enforce_cache_limits()
     
     def get_security_context(self, rule_id: str) -> Optional[SecurityContext]:
         """Get security context for a rule"""
@@ -504,26 +2286,22 @@ password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())''',
     def generate_automated_fix(self, issue, code_snippet: str) -> Dict[str, Any]:
         """Generate automated fix if available"""
         
-        fix_pattern = self.fix_patterns.get(issue.rule_id)
-        if not fix_pattern:
+        fix_rule = self.fix_engine.get(issue.rule_id)
+        if not fix_rule:
             return {'available': False, 'reason': 'No automated fix pattern available'}
         
         try:
-            # Apply the fix pattern
-            import re
-            pattern = fix_pattern['pattern']
-            replacement = fix_pattern['replacement']
+            # Apply the precompiled fix pattern in a single pass
+            fixed_code, replacements = self.fix_engine.apply_rule(issue.rule_id, code_snippet)
             
-            if re.search(pattern, code_snippet):
-                fixed_code = re.sub(pattern, replacement, code_snippet)
-                
+            if replacements:
                 return {
                     'available': True,
                     'original_code': code_snippet,
                     'fixed_code': fixed_code,
-                    'required_imports': fix_pattern.get('imports', []),
-                    'confidence': fix_pattern.get('confidence', 'medium'),
-                    'description': fix_pattern.get('description', 'Automated security fix applied')
+                    'required_imports': fix_rule.imports,
+                    'confidence': fix_rule.confidence,
+                    'description': fix_rule.description
                 }
             else:
                 return {'available': False, 'reason': 'Pattern does not match current code'}
@@ -531,10 +2309,166 @@ password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())''',
         except Exception as e:
             return {'available': False, 'reason': f'Fix generation failed: {str(e)}'}
     
-    def bulk_generate_suggestions(self, issues: List, max_workers: int = 5) -> Dict[str, CopilotSuggestion]:
-        """Generate suggestions for multiple issues concurrently"""
+    def generate_all_automated_fixes(self, code: str) -> Dict[str, Any]:
+        """Apply every matching fix rule to a snippet or whole file in one sweep"""
+        
+        try:
+            fixed_code, applied = self.fix_engine.apply_all(code)
+        except Exception as e:
+            return {'available': False, 'reason': f'Fix generation failed: {str(e)}'}
+        
+        if not applied:
+            return {'available': False, 'reason': 'No fix pattern matches current code'}
+        
+        required_imports = []
+        for rule_id in applied:
+            for import_line in self.fix_engine.get(rule_id).imports:
+                if import_line not in required_imports:
+                    required_imports.append(import_line)
+        
+        return {
+            'available': True,
+            'original_code': code,
+            'fixed_code': fixed_code,
+            'applied_rules': applied,
+            'required_imports': required_imports
+        }
+    
+    def _fix_rules_for_extension(self, extension: str) -> List[str]:
+        """Fix rules that apply to files with the given extension"""
+        rule_ids = []
+        for rule_id in self.fix_engine.rules:
+            extensions = self.fix_patterns[rule_id].get('extensions')
+            if extensions is None:
+                extensions = next((exts for prefix, exts in RULE_PREFIX_EXTENSIONS.items()
+                                   if rule_id.startswith(prefix)), None)
+            if extensions is None or extension.lower() in extensions:
+                rule_ids.append(rule_id)
+        return rule_ids
+    
+    def generate_repository_fixes(self, issues: Optional[List] = None,
+                                  directory: Optional[str] = None,
+                                  max_workers: Optional[int] = None,
+                                  write: bool = False,
+                                  files_per_task: int = 32,
+                                  progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+                                  ) -> Iterator[Dict[str, Any]]:
+        """Apply automated fixes across many files in a process pool
+        
+        Work comes either from issues (each file gets the fix rules of its
+        issues) or from every file under directory (each file gets the rules
+        for its language). Yields one result per changed or failed file with a
+        unified diff, the rules applied and the imports added; with write=True
+        the patched file is also written in place. progress_callback receives
+        counts and throughput after every completed task.
+        """
+        
+        rules_by_file: Dict[str, set] = {}
+        if issues is not None:
+            for issue in issues:
+                if self.fix_engine.get(issue.rule_id):
+                    rules_by_file.setdefault(issue.file_path, set()).add(issue.rule_id)
+        elif directory is not None:
+            rules_by_extension: Dict[str, List[str]] = {}
+            for root, dirs, files in os.walk(directory):
+                dirs[:] = [d for d in dirs if not d.startswith('.') and d != '__pycache__']
+                for name in files:
+                    extension = Path(name).suffix
+                    if not extension:
+                        continue
+                    if extension not in rules_by_extension:
+                        rules_by_extension[extension] = self._fix_rules_for_extension(extension)
+                    if rules_by_extension[extension]:
+                        rules_by_file[os.path.join(root, name)] = set(rules_by_extension[extension])
+        else:
+            raise ValueError("Either issues or directory is required")
+        
+        jobs = [(file_path,
+                 os.path.relpath(file_path, directory) if directory else file_path.lstrip('/'),
+                 sorted(rule_ids))
+                for file_path, rule_ids in rules_by_file.items()]
+        tasks = [jobs[i:i + files_per_task] for i in range(0, len(jobs), files_per_task)]
+        
+        progress = {'files_total': len(jobs), 'files_done': 0, 'files_changed': 0,
+                    'fixes_applied': 0, 'errors': 0, 'elapsed_seconds': 0.0, 'files_per_second': 0.0}
+        started = time.perf_counter()
+        
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers, initializer=_init_fix_worker,
+                initargs=({rule_id: dict(fix_pattern)
+                           for rule_id, fix_pattern in self.fix_patterns.items()},)) as executor:
+            futures = [executor.submit(_fix_source_files, task, write) for task in tasks]
+            for future in concurrent.futures.as_completed(futures):
+                changed = []
+                for result in future.result():
+                    progress['files_done'] += 1
+                    if 'error' in result:
+                        progress['errors'] += 1
+                        changed.append(result)
+                    elif result['applied_rules']:
+                        progress['files_changed'] += 1
+                        progress['fixes_applied'] += sum(result['applied_rules'].values())
+                        changed.append(result)
+                
+                progress['elapsed_seconds'] = time.perf_counter() - started
+                progress['files_per_second'] = progress['files_done'] / max(progress['elapsed_seconds'], 1e-9)
+                if progress_callback:
+                    progress_callback(dict(progress))
+                
+                yield from changed
+        
+        print(f"✅ Repository fixes: {progress['fixes_applied']} fixes in {progress['files_changed']} "
+              f"of {progress['files_total']} files ({progress['files_per_second']:.0f} files/s)")
+    
+    def bulk_generate_suggestions(self, issues: List, max_workers: Optional[int] = None,
+                                  batch_size: int = 1,
+                                  deadline: Optional[float] = None) -> Dict[str, CopilotSuggestion]:
+        """Generate suggestions for multiple issues concurrently
+        
+        Issues are processed by severity, then by the rule's impact level.
+        With batch_size > 1, cache misses are sent to Copilot batch_size issues
+        per gh invocation. max_workers defaults to the Copilot concurrency
+        ceiling; the number of gh calls actually in flight follows the adaptive
+        limiter, and an open circuit breaker turns misses into template results.
+        If deadline (seconds) elapses, issues still pending get template
+        suggestions and the call returns.
+        """
+        
+        deadline_at = time.monotonic() + deadline if deadline is not None else None
+        
+        # Get code snippets for all issues, one read per file
+        issue_data_list = list(zip(issues, self._get_code_snippets(issues)))
+        return self._bulk_generate(issue_data_list, max_workers, batch_size, deadline_at)
+    
+    def _issue_priority(self, issue) -> Tuple[int, int]:
+        """Scheduling priority of an issue from its severity and rule impact level"""
+        security_context = self.security_contexts.get(issue.rule_id)
+        impact_level = security_context.impact_level if security_context else None
+        return (SEVERITY_RANKS.get(str(getattr(issue, 'severity', '')).upper(), UNKNOWN_SEVERITY_RANK),
+                SEVERITY_RANKS.get(str(impact_level).upper(), UNKNOWN_SEVERITY_RANK))
+    
+    def _bulk_generate(self, issue_data_list: List[Tuple[Any, str]], max_workers: Optional[int] = None,
+                       batch_size: int = 1,
+                       deadline_at: Optional[float] = None) -> Dict[str, CopilotSuggestion]:
+        """Generate suggestions for (issue, code snippet) pairs concurrently
+        
+        Workers take issues from a priority queue, most severe first. Once
+        deadline_at (a time.monotonic() value) passes, workers stop taking new
+        work, gh processes still running are killed, and every issue without
+        a result gets a template suggestion.
+        """
         
         results = {}
+        if max_workers is None:
+            max_workers = self.copilot_limiter.max_limit
+        
+        # Priority queue of (severity rank, impact rank, input position, issue data)
+        queue = [self._issue_priority(issue_data[0]) + (position, issue_data)
+                 for position, issue_data in enumerate(issue_data_list)]
+        heapq.heapify(queue)
+        queue_lock = threading.Lock()
+        take = batch_size if batch_size > 1 and self.copilot_available else 1
+        group = CopilotProcessGroup()
         
         def process_issue(issue_data):
             issue, code_snippet = issue_data
@@ -544,59 +2478,404 @@ password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())''',
             except Exception as e:
                 print(f"⚠️ Error processing issue {issue.id}: {e}")
         
+        def process_batch(batch):
+            try:
+                results.update(self._generate_suggestion_batch(batch))
+            except Exception as e:
+                print(f"⚠️ Error processing batch of {len(batch)} issues: {e}")
+        
+        def worker():
+            self._process_group.current = group
+            while deadline_at is None or time.monotonic() < deadline_at:
+                with queue_lock:
+                    if not queue:
+                        return
+                    work = [heapq.heappop(queue)[-1] for _ in range(min(take, len(queue)))]
+                if take > 1:
+                    process_batch(work)
+                else:
+                    process_issue(work[0])
+        
         # Process issues in parallel
-        import concurrent.futures
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        futures = [executor.submit(worker) for _ in range(min(max_workers, len(queue)))]
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            issue_data_list = []
-            for issue in issues:
-                # Get code snippet for each issue
-                code_snippet = self._get_code_snippet(issue.file_path, issue.line_number)
-                issue_data_list.append((issue, code_snippet))
+        # Wait for completion or the deadline; at the deadline running gh calls are
+        # killed so workers (and interpreter exit) are not held up by them
+        timeout = max(0.0, deadline_at - time.monotonic()) if deadline_at is not None else None
+        _, not_done = concurrent.futures.wait(futures, timeout=timeout)
+        if not_done:
+            group.cancel()
+        executor.shutdown(wait=not not_done)
+        
+        if deadline_at is None or (not not_done and not queue):
+            return results
+        
+        # Deadline reached: fill every unfinished issue with an instant template suggestion
+        finished = dict(results)
+        fallbacks = 0
+        for issue, code_snippet in issue_data_list:
+            if issue.id not in finished:
+                finished[issue.id] = self._build_suggestion(issue, code_snippet, None)
+                fallbacks += 1
+        self.metrics.count('deadline_template_fallbacks', fallbacks)
+        print(f"⚠️ Deadline reached; {fallbacks} issues received template suggestions")
+        return finished
+    
+    def incremental_generate_suggestions(self, issues: List, project: str,
+                                         max_workers: Optional[int] = None,
+                                         batch_size: int = 1,
+                                         deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Generate suggestions for a scan, reusing results from the project's previous run
+        
+        A per-project manifest maps (file_path, rule_id, snippet hash) to the
+        cache key used last time. Unchanged findings are served from that
+        entry, new or changed findings are regenerated (most severe first,
+        within deadline as in bulk_generate_suggestions), and findings that no
+        longer appear are dropped from the manifest. Their cache entries are
+        deleted only for issue-keyed entries; normalized (v2) entries may be
+        shared with other projects and are left to expire_cache.
+        """
+        
+        deadline_at = time.monotonic() + deadline if deadline is not None else None
+        
+        manifest_file = self._manifest_path(project)
+        previous_manifest = self._load_manifest(manifest_file)
+        
+        suggestions: Dict[str, CopilotSuggestion] = {}
+        manifest: Dict[str, str] = {}
+        to_generate = []
+        reused = 0
+        
+        for issue, code_snippet in zip(issues, self._get_code_snippets(issues)):
+            snippet_hash = hashlib.md5(code_snippet.encode()).hexdigest()
+            manifest_key = f"{issue.file_path}\x00{issue.rule_id}\x00{snippet_hash}"
             
-            # Submit all tasks
-            futures = [executor.submit(process_issue, issue_data) for issue_data in issue_data_list]
+            previous_key = previous_manifest.get(manifest_key)
+            if previous_key:
+                cached_suggestion = self._lookup_cached_suggestion(issue, code_snippet, previous_key)
+                if cached_suggestion:
+                    suggestions[issue.id] = cached_suggestion
+                    manifest[manifest_key] = previous_key
+                    reused += 1
+                    continue
             
-            # Wait for completion
-            concurrent.futures.wait(futures)
+            manifest[manifest_key] = self._suggestion_cache_key(issue, code_snippet)
+            to_generate.append((issue, code_snippet))
+        
+        suggestions.update(self._bulk_generate(to_generate, max_workers, batch_size, deadline_at))
+        
+        # Retire findings that vanished since the previous run; normalized keys
+        # can be shared across projects, so only issue-keyed entries are deleted
+        live_keys = set(manifest.values())
+        dropped = 0
+        for manifest_key, cache_key in previous_manifest.items():
+            if manifest_key in manifest:
+                continue
+            dropped += 1
+            if cache_key not in live_keys and not cache_key.startswith(f"{CACHE_KEY_VERSION}-"):
+                self.suggestion_cache.discard(cache_key)
+                try:
+                    self.disk_cache.delete(cache_key)
+                except Exception as e:
+                    print(f"⚠️ Cache delete error: {e}")
+        
+        self._save_manifest(manifest_file, manifest)
+        
+        return {
+            'suggestions': suggestions,
+            'reused': reused,
+            'regenerated': len(to_generate),
+            'dropped': dropped
+        }
+    
+    def _manifest_path(self, project: str) -> Path:
+        """Manifest file for a project inside the cache directory"""
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', project)
+        return self.cache_dir / "manifests" / f"{safe_name}.manifest"
+    
+    def _load_manifest(self, manifest_file: Path) -> Dict[str, str]:
+        try:
+            with open(manifest_file, 'r') as f:
+                return json.load(f)['entries']
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable manifest {manifest_file}: {e}")
+            return {}
+    
+    def _save_manifest(self, manifest_file: Path, manifest: Dict[str, str]):
+        manifest_file.parent.mkdir(exist_ok=True)
+        temp_file = manifest_file.with_suffix('.tmp')
+        try:
+            with open(temp_file, 'w') as f:
+                json.dump({'generated_at': datetime.now().isoformat(), 'entries': manifest}, f)
+            os.replace(temp_file, manifest_file)
+        except Exception as e:
+            print(f"⚠️ Manifest write error: {e}")
+    
+    async def agenerate_security_suggestion(self, issue, code_snippet: str,
+                                            file_context: str = None) -> CopilotSuggestion:
+        """Async variant of generate_security_suggestion"""
+        
+        cache_key = self._suggestion_cache_key(issue, code_snippet)
+        cached_suggestion = await asyncio.to_thread(
+            self._lookup_cached_suggestion, issue, code_snippet, cache_key)
+        if cached_suggestion:
+            return cached_suggestion
+        
+        copilot_result = None
+        if await asyncio.to_thread(lambda: self.copilot_available):
+            copilot_result = await self._query_copilot_async(issue, code_snippet, file_context)
+        
+        suggestion = self._build_suggestion(issue, code_snippet, copilot_result)
+        await asyncio.to_thread(self._cache_suggestion, cache_key, suggestion,
+                                self._copilot_skipped(copilot_result))
+        
+        return suggestion
+    
+    async def stream_bulk_suggestions(self, issues: List, max_concurrency: int = 5
+                                      ) -> AsyncIterator[Tuple[str, CopilotSuggestion]]:
+        """Yield (issue_id, suggestion) pairs as soon as each issue completes
+        
+        At most max_concurrency issues are processed at once. Closing the
+        iterator or cancelling the consuming task cancels outstanding work
+        and kills any running gh processes.
+        """
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def process_issue(issue):
+            async with semaphore:
+                try:
+                    code_snippet = await asyncio.to_thread(
+                        self._get_code_snippet, issue.file_path, issue.line_number)
+                    return issue.id, await self.agenerate_security_suggestion(issue, code_snippet)
+                except Exception as e:
+                    print(f"⚠️ Error processing issue {issue.id}: {e}")
+                    return None
+        
+        tasks = [asyncio.ensure_future(process_issue(issue)) for issue in issues]
+        try:
+            for next_completed in asyncio.as_completed(tasks):
+                result = await next_completed
+                if result is not None:
+                    yield result
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def _generate_suggestion_batch(self, issue_data: List[Tuple[Any, str]]) -> Dict[str, CopilotSuggestion]:
+        """Serve cache hits and generate the misses with one batched Copilot query
+        
+        Each issue is recorded in the 'total' stage: a cache hit with its own
+        lookup time, a batched issue with the time until its result was ready.
+        """
+        
+        results = {}
+        pending = []
+        batch_started = time.perf_counter()
+        for issue, code_snippet in issue_data:
+            lookup_started = time.perf_counter()
+            cache_key = self._suggestion_cache_key(issue, code_snippet)
+            cached_suggestion = self._lookup_cached_suggestion(issue, code_snippet, cache_key)
+            if cached_suggestion:
+                results[issue.id] = cached_suggestion
+                if self.metrics.enabled:
+                    self.metrics.observe('total', time.perf_counter() - lookup_started)
+            else:
+                pending.append((issue, code_snippet, cache_key))
+        
+        if pending:
+            copilot_results = self._query_copilot_batch([(issue, snippet) for issue, snippet, _ in pending])
+            for issue, code_snippet, cache_key in pending:
+                copilot_result = copilot_results.get(issue.id)
+                suggestion = self._build_suggestion(issue, code_snippet, copilot_result)
+                self._cache_suggestion(cache_key, suggestion, refreshable=self._copilot_skipped(copilot_result))
+                results[issue.id] = suggestion
+                if self.metrics.enabled:
+                    self.metrics.observe('total', time.perf_counter() - batch_started)
         
         return results
     
     def _get_code_snippet(self, file_path: str, line_number: int, context_lines: int = 5) -> str:
         """Get code snippet around the specified line"""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-            
-            start = max(0, line_number - context_lines - 1)
-            end = min(len(lines), line_number + context_lines)
-            
-            return ''.join(lines[start:end])
+            return self._get_line_index(file_path).snippet(line_number, context_lines)
             
         except Exception as e:
             print(f"⚠️ Error reading file {file_path}: {e}")
             return ""
     
+    def _get_code_snippets(self, issues: List, context_lines: int = 5) -> List[str]:
+        """Get code snippets for many issues, reading each distinct file once"""
+        issues_by_file: Dict[str, List[int]] = {}
+        for position, issue in enumerate(issues):
+            issues_by_file.setdefault(issue.file_path, []).append(position)
+        
+        snippets = [""] * len(issues)
+        for file_path, positions in issues_by_file.items():
+            try:
+                line_index = self._get_line_index(file_path)
+            except Exception as e:
+                print(f"⚠️ Error reading file {file_path}: {e}")
+                continue
+            for position in positions:
+                snippets[position] = line_index.snippet(issues[position].line_number, context_lines)
+        
+        return snippets
+    
+    def _get_line_index(self, file_path: str) -> SourceLineIndex:
+        """Return the line index for a file, rebuilding it when mtime or size change"""
+        stat = os.stat(file_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        
+        with self._line_index_lock:
+            line_index = self._line_index_cache.get(file_path)
+            if line_index is not None and line_index.signature == signature:
+                self._line_index_cache.move_to_end(file_path)
+                return line_index
+        
+        line_index = SourceLineIndex.from_file(file_path, signature)
+        with self._line_index_lock:
+            self._line_index_cache[file_path] = line_index
+            self._line_index_cache.move_to_end(file_path)
+            while len(self._line_index_cache) > self.max_indexed_files:
+                self._line_index_cache.popitem(last=False)
+        return line_index
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Stage latency percentiles, Copilot outcome counts and per-tier hit ratios"""
+        snapshot = self.metrics.snapshot()
+        with self._counters_lock:
+            counters = dict(self.cache_counters)
+        
+        hit_ratios = {}
+        for tier in ('memory', 'disk'):
+            lookups = counters[f'{tier}_hits'] + counters[f'{tier}_misses']
+            hit_ratios[tier] = counters[f'{tier}_hits'] / lookups if lookups else 0.0
+        snapshot['cache_hit_ratios'] = hit_ratios
+        return snapshot
+    
+    def reset_metrics(self):
+        """Clear stage latencies, Copilot outcome counts and cache counters"""
+        self.metrics.reset()
+        with self._counters_lock:
+            for name in self.cache_counters:
+                self.cache_counters[name] = 0
+    
+    def get_copilot_status(self) -> Dict[str, Any]:
+        """Current adaptive concurrency limit and circuit breaker state"""
+        return {
+            'available': self.copilot_available,
+            'concurrency': self.copilot_limiter.stats(),
+            'circuit_breaker': self.circuit_breaker.stats()
+        }
+    
+    def export_prometheus_metrics(self) -> str:
+        """Metrics in Prometheus text format, including cache counters"""
+        text = self.metrics.to_prometheus()
+        with self._counters_lock:
+            counters = dict(self.cache_counters)
+        lines = []
+        for name in sorted(counters):
+            lines.append(f"# TYPE copilot_suggestion_cache_{name}_total counter")
+            lines.append(f"copilot_suggestion_cache_{name}_total {counters[name]}")
+        return text + '\n'.join(lines) + '\n'
+    
     def clear_cache(self):
         """Clear all cached suggestions"""
+        self.suggestion_cache.clear()
+        with self._counters_lock:
+            self._refreshable_keys.clear()
         try:
-            for cache_file in self.cache_dir.glob("*.json"):
-                cache_file.unlink()
+            self.disk_cache.clear()
             print("✅ Cache cleared successfully")
         except Exception as e:
             print(f"⚠️ Error clearing cache: {e}")
+
+    def expire_cache(self, batch_size: Optional[int] = None) -> int:
+        """Remove disk cache entries older than the longest persisted TTL
+        
+        Entries of sources with a shorter TTL are dropped when next read.
+        """
+        try:
+            ttls = [policy.ttl or self.cache_duration
+                    for policy in self.cache_policies.values() if policy.persist]
+            cutoff = datetime.now() - max(ttls + [self.cache_duration])
+            if batch_size:
+                removed = self.disk_cache.expire(cutoff, batch_size=batch_size)
+            else:
+                removed = self.disk_cache.expire(cutoff)
+        except Exception as e:
+            print(f"⚠️ Error expiring cache: {e}")
+            return 0
+        
+        with self._counters_lock:
+            self.cache_counters['expired_entries'] += removed
+        return removed
     
+    def enforce_cache_limits(self) -> int:
+        """Evict disk cache entries until the entry and byte caps are met"""
+        if self.max_cache_entries is None and self.max_cache_bytes is None:
+            return 0
+        try:
+            evicted = self.disk_cache.evict(self.max_cache_entries, self.max_cache_bytes,
+                                            self.eviction_policy)
+        except Exception as e:
+            print(f"⚠️ Error evicting cache entries: {e}")
+            return 0
+        
+        with self._counters_lock:
+            self.cache_counters['evicted_entries'] += evicted
+        return evicted
+    
+    def start_cache_sweeper(self, interval: float = 300.0, batch_size: int = 500):
+        """Start a daemon thread that expires and evicts cache entries every interval seconds"""
+        if self._sweeper_thread is not None:
+            return
+        
+        def sweep():
+            while not self._sweeper_stop.wait(interval):
+                self.expire_cache(batch_size=batch_size)
+                self.enforce_cache_limits()
+                with self._counters_lock:
+                    self.cache_counters['sweeps'] += 1
+        
+        self._sweeper_stop.clear()
+        self._sweeper_thread = threading.Thread(target=sweep, name="copilot-cache-sweeper",
+                                                daemon=True)
+        self._sweeper_thread.start()
+    
+    def stop_cache_sweeper(self):
+        """Stop the background sweeper thread if it is running"""
+        if self._sweeper_thread is None:
+            return
+        self._sweeper_stop.set()
+        self._sweeper_thread.join()
+        self._sweeper_thread = None
+
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
         try:
-            cache_files = list(self.cache_dir.glob("*.json"))
-            total_size = sum(f.stat().st_size for f in cache_files)
+            total_entries, total_size = self.disk_cache.stats()
+            
+            with self._counters_lock:
+                counters = dict(self.cache_counters)
             
             return {
-                'total_entries': len(cache_files),
+                'total_entries': total_entries,
                 'total_size_bytes': total_size,
                 'total_size_mb': total_size / (1024 * 1024),
-                'cache_directory': str(self.cache_dir)
+                'cache_directory': str(self.cache_dir),
+                'cache_backend': self.cache_backend,
+                'cache_format': self.cache_format,
+                'memory_entries': len(self.suggestion_cache),
+                'memory_size_bytes': self.suggestion_cache.total_bytes,
+                'memory_evictions': self.suggestion_cache.evictions,
+                **counters
             }
         except Exception as e:
             return {'error': str(e)}
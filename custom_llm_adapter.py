@@ -1,11 +1,158 @@
 """Custom LLM adapter for APIs using CrewAI's BaseLLM."""
+import asyncio
+import concurrent.futures
+import hashlib
+import inspect
+import json
 import logging
+import os
+import random
+import threading
+import time
 import httpx
-from typing import Any, Dict, List, Optional, Union
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Union
 from crewai import BaseLLM
 
 logger = logging.getLogger(__name__)
 
+# Marker returned by the stream line parser for the terminating "[DONE]" event
+_STREAM_DONE = object()
+
+# HTTP statuses worth retrying (rate limiting and transient server errors)
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# Successful attempts observed before hedging uses the measured p95 latency
+HEDGE_MIN_SAMPLES = 20
+
+
+class LatencyBudgetExceeded(httpx.TimeoutException):
+    """Raised when a call's overall latency budget runs out."""
+    
+    def __init__(self, message: str):
+        super().__init__(message)
+
+
+class LLMResponseCache:
+    """
+    Response cache for deterministic LLM calls.
+    
+    Keeps a memory LRU tier and, when cache_dir is given, a disk tier with one
+    JSON file per key. Entries older than ttl seconds (None = no expiry) are
+    treated as misses. Safe to share across threads.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: Optional[float] = 3600.0,
+        cache_dir: Optional[str] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+    
+    @staticmethod
+    def make_key(request: Dict[str, Any]) -> str:
+        """Stable hash of the request fields that determine the response."""
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.time() - created_at > self.ttl
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._entries.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+        
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._store_memory(key, entry)
+        return entry[1]
+    
+    def put(self, key: str, response: str) -> None:
+        """Cache a response in memory and, if configured, on disk."""
+        entry = (time.time(), response)
+        with self._lock:
+            self._store_memory(key, entry)
+            self._stats["writes"] += 1
+        self._write_disk(key, entry)
+    
+    def _store_memory(self, key: str, entry: Tuple[float, str]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+    
+    def _read_disk(self, key: str) -> Optional[Tuple[float, str]]:
+        if not self.cache_dir:
+            return None
+        path = self.cache_dir / f"{key}.json"
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            entry = (float(data["created_at"]), data["response"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Discarding unreadable LLM cache entry {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        if self._expired(entry[0]):
+            path.unlink(missing_ok=True)
+            return None
+        return entry
+    
+    def _write_disk(self, key: str, entry: Tuple[float, str]) -> None:
+        if not self.cache_dir:
+            return
+        path = self.cache_dir / f"{key}.json"
+        temp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"created_at": entry[0], "response": entry[1]}, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write LLM cache entry {path}: {e}")
+            temp_path.unlink(missing_ok=True)
+    
+    def clear(self) -> None:
+        """Drop all cached responses from both tiers."""
+        with self._lock:
+            self._entries.clear()
+        if self.cache_dir:
+            for path in self.cache_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and hit ratio."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._entries)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
 
 class CustomLLMAdapter(BaseLLM):
     """
@@ -13,6 +160,24 @@ class CustomLLMAdapter(BaseLLM):
     
     This adapter properly extends CrewAI's BaseLLM to ensure CrewAI recognizes it
     and doesn't wrap it in its own OpenAI provider.
+    
+    Unless an http_client is injected, the adapter owns one pooled keep-alive
+    client shared by all calls and threads; release it with close() or by
+    using the adapter as a context manager. acall() likewise uses an injected
+    async_http_client or a pooled httpx.AsyncClient, released by aclose() or
+    ``async with``.
+    
+    With stream=True, call() and acall() stream the completion, pass each
+    token to stream_callback, and return the assembled string.
+    
+    With cache_responses=True, deterministic calls (temperature 0, or an
+    explicit cache=True keyword) are answered from an LLMResponseCache.
+    
+    Non-streaming requests are retried on timeouts, connection errors and
+    429/5xx responses with exponential backoff, jitter and Retry-After, within
+    an optional per-call latency_budget. With hedge_requests=True, a duplicate
+    request is sent when the first has not answered after hedge_after seconds
+    (default: the observed p95 latency) and the first success is used.
     """
     
     def __init__(
@@ -21,7 +186,24 @@ class CustomLLMAdapter(BaseLLM):
         api_key: str,
         base_url: str,
         temperature: Optional[float] = None,
-        http_client: Optional[httpx.Client] = None
+        http_client: Optional[httpx.Client] = None,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        async_http_client: Optional[httpx.AsyncClient] = None,
+        stream: bool = False,
+        stream_callback: Optional[Callable[[str], None]] = None,
+        cache_responses: bool = False,
+        cache_dir: Optional[str] = None,
+        cache_ttl: Optional[float] = 3600.0,
+        cache_max_entries: int = 256,
+        max_retries: int = 2,
+        retry_backoff: float = 0.5,
+        retry_backoff_max: float = 8.0,
+        latency_budget: Optional[float] = None,
+        hedge_requests: bool = False,
+        hedge_after: Optional[float] = None
     ):
         # CRITICAL: Call parent constructor with required parameters
         super().__init__(model=model, temperature=temperature)
@@ -29,6 +211,159 @@ class CustomLLMAdapter(BaseLLM):
         self.api_key = api_key
         self.base_url = base_url
         self.http_client = http_client
+        self.async_http_client = async_http_client
+        
+        # Streaming mode: tokens go to stream_callback, timings to last_stream_stats
+        self.stream = stream
+        self.stream_callback = stream_callback
+        self.last_stream_stats: Optional[Dict[str, Any]] = None
+        
+        # Opt-in cache for deterministic responses (memory LRU, plus disk if cache_dir is set)
+        self.response_cache: Optional[LLMResponseCache] = (
+            LLMResponseCache(cache_max_entries, cache_ttl, cache_dir) if cache_responses else None
+        )
+        
+        # Connection pool settings for the adapter-owned client
+        self.pool_limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http2 = http2
+        self._owned_client: Optional[httpx.Client] = None
+        self._owned_async_client: Optional[httpx.AsyncClient] = None
+        self._async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client_lock = threading.Lock()
+        self._pool_stats = {"requests": 0, "in_flight": 0, "peak_in_flight": 0, "clients_created": 0}
+        
+        # Retries, latency budget and hedging for non-streaming requests
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self.latency_budget = latency_budget
+        self.hedge_requests = hedge_requests
+        self.hedge_after = hedge_after
+        self._latencies: deque = deque(maxlen=200)
+        self._hedge_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._resilience_stats = {"retries": 0, "hedged_requests": 0, "hedge_wins": 0}
+    
+    def _get_client(self) -> httpx.Client:
+        """Return the injected client, or the adapter's pooled client (created on first use)."""
+        if self.http_client is not None:
+            return self.http_client
+        
+        client = self._owned_client
+        if client is None:
+            with self._client_lock:
+                if self._owned_client is None:
+                    self._owned_client = self._create_client()
+                    self._pool_stats["clients_created"] += 1
+                client = self._owned_client
+        return client
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Return the injected async client, or the adapter's pooled one for the running loop."""
+        if self.async_http_client is not None:
+            return self.async_http_client
+        
+        # Async connections are bound to the event loop that opened them
+        loop = asyncio.get_running_loop()
+        stale_client = stale_loop = None
+        with self._client_lock:
+            if self._owned_async_client is None or self._async_client_loop is not loop:
+                stale_client, stale_loop = self._owned_async_client, self._async_client_loop
+                self._owned_async_client = self._create_client(httpx.AsyncClient)
+                self._async_client_loop = loop
+                self._pool_stats["clients_created"] += 1
+            client = self._owned_async_client
+        if stale_client is not None:
+            self._close_stale_async_client(stale_client, stale_loop)
+        return client
+    
+    def _close_stale_async_client(self, client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop) -> None:
+        """Best-effort close of a pooled async client left behind by a previous event loop."""
+        # Its connections can only be closed on the loop that opened them
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            logger.debug("Event loop changed; closing the previous pooled async client on its own loop")
+            return
+        logger.warning(
+            "Pooled async client belongs to an event loop that is no longer running; it could not be closed "
+            "and its connections are leaked. Call 'await adapter.aclose()' (or use 'async with adapter') "
+            "before the event loop ends."
+        )
+    
+    def _create_client(self, client_class: type = httpx.Client):
+        """Create a pooled keep-alive client, falling back to HTTP/1.1 if h2 is missing."""
+        timeout = httpx.Timeout(30.0, read=120.0)
+        if self.http2:
+            try:
+                return client_class(limits=self.pool_limits, timeout=timeout, http2=True)
+            except ImportError:
+                logger.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+        return client_class(limits=self.pool_limits, timeout=timeout)
+    
+    def _track_request(self, delta: int) -> None:
+        """Update in-flight request counters used by pool_stats()."""
+        with self._client_lock:
+            stats = self._pool_stats
+            stats["in_flight"] += delta
+            if delta > 0:
+                stats["requests"] += 1
+                stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Return request counters and, when available, connection pool usage."""
+        with self._client_lock:
+            stats = dict(self._pool_stats)
+        stats["owned_client"] = self.http_client is None
+        stats["max_connections"] = self.pool_limits.max_connections
+        stats["max_keepalive_connections"] = self.pool_limits.max_keepalive_connections
+        
+        # Connection counts come from httpcore internals, so report them best-effort
+        clients = (("", self.http_client or self._owned_client),
+                   ("async_", self.async_http_client or self._owned_async_client))
+        for prefix, client in clients:
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = getattr(pool, "connections", None)
+            if connections is not None:
+                stats[f"{prefix}connections"] = len(connections)
+                stats[f"{prefix}idle_connections"] = sum(1 for connection in connections if connection.is_idle())
+        return stats
+    
+    def close(self) -> None:
+        """Close the adapter-owned client; an injected http_client is left open."""
+        with self._client_lock:
+            client, self._owned_client = self._owned_client, None
+            executor, self._hedge_executor = self._hedge_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        if client is not None:
+            client.close()
+    
+    async def aclose(self) -> None:
+        """Close the adapter-owned sync and async clients; injected clients are left open."""
+        with self._client_lock:
+            client, self._owned_async_client = self._owned_async_client, None
+            loop, self._async_client_loop = self._async_client_loop, None
+        if client is not None:
+            if loop is asyncio.get_running_loop():
+                await client.aclose()
+            else:
+                self._close_stale_async_client(client, loop)
+        self.close()
+    
+    def __enter__(self) -> "CustomLLMAdapter":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+    
+    async def __aenter__(self) -> "CustomLLMAdapter":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
     
     def call(
         self,
@@ -46,11 +381,311 @@ class CustomLLMAdapter(BaseLLM):
             tools: Optional list of tool definitions
             callbacks: Optional callbacks
             available_functions: Optional dict of available functions
-            **kwargs: Additional keyword arguments (e.g., from_task) that CrewAI may pass
+            **kwargs: Additional keyword arguments (e.g., from_task) that CrewAI may pass;
+                cache=True/False forces or skips the response cache
+            
+        Returns:
+            String response from the LLM
+        """
+        cache_key = self._response_cache_key(messages, tools, available_functions, kwargs)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return self._replay_cached(cached)
+        
+        response = self._complete(messages, tools, callbacks, available_functions)
+        if cache_key is not None:
+            self.response_cache.put(cache_key, response)
+        return response
+    
+    def _complete(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Make the LLM request for call(), streaming it when enabled."""
+        if self.stream:
+            tokens = []
+            for token in self.stream_call(messages, tools, callbacks, available_functions):
+                if self.stream_callback:
+                    self.stream_callback(token)
+                tokens.append(token)
+            return "".join(tokens)
+        
+        messages, payload = self._build_payload(messages, tools)
+        headers = self._build_headers()
+        endpoint = self._resolve_endpoint()
+        
+        # Use provided http_client or the adapter's pooled keep-alive client
+        client = self._get_client()
+        
+        # Log the request for debugging
+        logger.debug(f"Making LLM request to: {endpoint}")
+        logger.debug(f"Request payload: model={payload.get('model')}, messages_count={len(payload.get('messages', []))}")
+        
+        self._track_request(1)
+        try:
+            # Timeouts of 30s connect, 120s read (LLM APIs can be slow), within any latency budget
+            response_data = self._post_json(client, endpoint, headers, payload)
+            
+            content, tool_calls = self._parse_response(response_data)
             
+            # Handle function calling if present
+            if tool_calls and available_functions:
+                return self._handle_function_calls(tool_calls, messages, tools, available_functions)
+            
+            # Return string content (required by CrewAI)
+            return content if isinstance(content, str) else str(content)
+            
+        except httpx.HTTPError as e:
+            raise self._request_error(e, endpoint)
+        except (KeyError, IndexError) as e:
+            raise ValueError(f"Invalid response format: {str(e)}. Response: {response_data if 'response_data' in locals() else 'N/A'}")
+        finally:
+            # The pooled client stays open so later calls reuse its connections
+            self._track_request(-1)
+    
+    async def acall(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> Union[str, Any]:
+        """
+        Async version of call() built on a pooled httpx.AsyncClient.
+        
+        Endpoint resolution, response normalization, tool-call handling and
+        response caching match call(); available functions may be plain
+        callables or coroutine functions.
+        
         Returns:
             String response from the LLM
         """
+        cache_key = self._response_cache_key(messages, tools, available_functions, kwargs)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return self._replay_cached(cached)
+        
+        response = await self._acomplete(messages, tools, callbacks, available_functions)
+        if cache_key is not None:
+            self.response_cache.put(cache_key, response)
+        return response
+    
+    async def _acomplete(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Make the LLM request for acall(), streaming it when enabled."""
+        if self.stream:
+            tokens = []
+            async for token in self.astream_call(messages, tools, callbacks, available_functions):
+                if self.stream_callback:
+                    self.stream_callback(token)
+                tokens.append(token)
+            return "".join(tokens)
+        
+        messages, payload = self._build_payload(messages, tools)
+        headers = self._build_headers()
+        endpoint = self._resolve_endpoint()
+        
+        # Use provided async_http_client or the adapter's pooled async client
+        client = self._get_async_client()
+        
+        logger.debug(f"Making async LLM request to: {endpoint}")
+        logger.debug(f"Request payload: model={payload.get('model')}, messages_count={len(payload.get('messages', []))}")
+        
+        self._track_request(1)
+        try:
+            response_data = await self._apost_json(client, endpoint, headers, payload)
+            
+            content, tool_calls = self._parse_response(response_data)
+            
+            if tool_calls and available_functions:
+                return await self._ahandle_function_calls(tool_calls, messages, tools, available_functions)
+            
+            return content if isinstance(content, str) else str(content)
+            
+        except httpx.HTTPError as e:
+            raise self._request_error(e, endpoint)
+        except (KeyError, IndexError) as e:
+            raise ValueError(f"Invalid response format: {str(e)}. Response: {response_data if 'response_data' in locals() else 'N/A'}")
+        finally:
+            self._track_request(-1)
+    
+    def stream_call(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> Iterator[str]:
+        """
+        Stream the completion, yielding content tokens as they arrive.
+        
+        Sends ``stream: true`` and parses OpenAI-style server-sent events as well
+        as LangChain-style chunks. Streamed tool calls are executed and the
+        follow-up completion is streamed in turn. Time-to-first-token and
+        tokens per second are stored in ``last_stream_stats``.
+        """
+        messages, payload = self._build_payload(messages, tools)
+        payload["stream"] = True
+        headers = self._build_headers()
+        headers["Accept"] = "text/event-stream"
+        endpoint = self._resolve_endpoint()
+        client = self._get_client()
+        timeout = httpx.Timeout(30.0, read=120.0)
+        
+        logger.debug(f"Making streaming LLM request to: {endpoint}")
+        
+        tool_calls: Dict[int, dict] = {}
+        started = time.perf_counter()
+        first_token_at = None
+        token_count = 0
+        self._track_request(1)
+        try:
+            with client.stream("POST", endpoint, headers=headers, json=payload, timeout=timeout) as response:
+                if response.is_error:
+                    response.read()
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    chunk = self._parse_stream_line(line)
+                    if chunk is _STREAM_DONE:
+                        break
+                    token = self._accumulate_chunk(chunk, tool_calls) if chunk else ""
+                    if token:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        token_count += 1
+                        yield token
+        except httpx.HTTPError as e:
+            raise self._request_error(e, endpoint)
+        finally:
+            self._track_request(-1)
+            self._record_stream_stats(started, first_token_at, token_count)
+        
+        if tool_calls and available_functions:
+            function_call = self._find_function_call(self._ordered_tool_calls(tool_calls), available_functions)
+            if function_call is None:
+                yield "Function call failed"
+                return
+            tool_call, function_name, function_args = function_call
+            function_result = available_functions[function_name](**function_args)
+            self._append_function_result(messages, tool_call, function_name, function_result)
+            yield from self.stream_call(messages, tools, None, available_functions)
+    
+    async def astream_call(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[str]:
+        """Async version of stream_call() on the pooled httpx.AsyncClient."""
+        messages, payload = self._build_payload(messages, tools)
+        payload["stream"] = True
+        headers = self._build_headers()
+        headers["Accept"] = "text/event-stream"
+        endpoint = self._resolve_endpoint()
+        client = self._get_async_client()
+        timeout = httpx.Timeout(30.0, read=120.0)
+        
+        logger.debug(f"Making async streaming LLM request to: {endpoint}")
+        
+        tool_calls: Dict[int, dict] = {}
+        started = time.perf_counter()
+        first_token_at = None
+        token_count = 0
+        self._track_request(1)
+        try:
+            async with client.stream("POST", endpoint, headers=headers, json=payload, timeout=timeout) as response:
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    chunk = self._parse_stream_line(line)
+                    if chunk is _STREAM_DONE:
+                        break
+                    token = self._accumulate_chunk(chunk, tool_calls) if chunk else ""
+                    if token:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        token_count += 1
+                        yield token
+        except httpx.HTTPError as e:
+            raise self._request_error(e, endpoint)
+        finally:
+            self._track_request(-1)
+            self._record_stream_stats(started, first_token_at, token_count)
+        
+        if tool_calls and available_functions:
+            function_call = self._find_function_call(self._ordered_tool_calls(tool_calls), available_functions)
+            if function_call is None:
+                yield "Function call failed"
+                return
+            tool_call, function_name, function_args = function_call
+            function_result = available_functions[function_name](**function_args)
+            if inspect.isawaitable(function_result):
+                function_result = await function_result
+            self._append_function_result(messages, tool_call, function_name, function_result)
+            async for token in self.astream_call(messages, tools, None, available_functions):
+                yield token
+    
+    def _response_cache_key(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]],
+        available_functions: Optional[Dict[str, Any]],
+        call_kwargs: Dict[str, Any]
+    ) -> Optional[str]:
+        """Cache key for a cacheable call, or None when the response must not be cached.
+        
+        Calls are cacheable at temperature 0 unless cache=False is passed, or at any
+        temperature with cache=True. Calls that may execute tools are never cached.
+        """
+        if self.response_cache is None or available_functions:
+            return None
+        cacheable = call_kwargs.get("cache")
+        if cacheable is None:
+            cacheable = self.temperature is not None and self.temperature == 0
+        if not cacheable:
+            return None
+        
+        _, payload = self._build_payload(messages, tools)
+        return LLMResponseCache.make_key({
+            "endpoint": self._resolve_endpoint(),
+            "model": payload["model"],
+            "messages": payload["messages"],
+            "temperature": payload["temperature"],
+            "stop": payload.get("stop"),
+            "tools": payload.get("tools"),
+        })
+    
+    def _replay_cached(self, response: str) -> str:
+        """Return a cached response, delivering it to stream_callback when streaming."""
+        if self.stream and self.stream_callback:
+            self.stream_callback(response)
+        return response
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Response cache hit/miss counters (empty when caching is disabled)."""
+        return self.response_cache.stats() if self.response_cache else {}
+    
+    def _build_payload(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]]
+    ) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """Normalize messages and build the chat completion request payload."""
         # Convert string to message format if needed
         if isinstance(messages, str):
             messages = [{"role": "user", "content": messages}]
@@ -70,12 +705,17 @@ class CustomLLMAdapter(BaseLLM):
         if tools and self.supports_function_calling():
             payload["tools"] = tools
         
-        # Make API request
-        headers = {
+        return messages, payload
+    
+    def _build_headers(self) -> Dict[str, str]:
+        """Request headers for the LLM API."""
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
-        
+    
+    def _resolve_endpoint(self) -> str:
+        """Determine the chat completions endpoint from base_url."""
         # Determine endpoint - handle various base_url formats
         # If base_url is already a complete endpoint, use it as-is
         base = self.base_url.rstrip('/')
@@ -98,61 +738,354 @@ class CustomLLMAdapter(BaseLLM):
             # This handles cases where the base_url is already the full endpoint
             endpoint = base
         
-        # Use provided http_client or create a new one
-        client = self.http_client or httpx.Client()
+        return endpoint
+    
+    def _parse_response(self, response_data: Dict[str, Any]) -> Tuple[Any, Optional[List[dict]]]:
+        """Extract the content and any tool calls from a LangChain or OpenAI style response."""
+        # Handle different response formats
+        # Check for LangChain AIMessage format first (has "content" and "type" fields)
+        if "content" in response_data and "type" in response_data and response_data.get("type") == "ai":
+            # This is LangChain AIMessage format
+            content = response_data.get("content", "")
+        elif "choices" in response_data and len(response_data["choices"]) > 0:
+            # This is OpenAI API format
+            content = response_data["choices"][0]["message"]["content"]
+        elif "content" in response_data:
+            # Fallback: just has content field
+            content = response_data.get("content", "")
+        else:
+            # Try to extract content from various possible formats
+            content = response_data.get("text") or response_data.get("message") or str(response_data)
         
-        # Configure timeout: 30s connect, 120s read (LLM APIs can be slow)
-        timeout = httpx.Timeout(30.0, read=120.0)
+        tool_calls = None
+        if "choices" in response_data and len(response_data["choices"]) > 0:
+            tool_calls = response_data["choices"][0]["message"].get("tool_calls")
         
-        # Log the request for debugging
-        logger.debug(f"Making LLM request to: {endpoint}")
-        logger.debug(f"Request payload: model={payload.get('model')}, messages_count={len(payload.get('messages', []))}")
+        return content, tool_calls
+    
+    def _post_json(
+        self,
+        client: httpx.Client,
+        endpoint: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """POST the payload with retries, backoff, Retry-After and optional hedging; returns the JSON body."""
+        deadline = time.monotonic() + self.latency_budget if self.latency_budget else None
+        attempt = 0
+        while True:
+            try:
+                hedge_after = self._hedge_delay()
+                if hedge_after is None:
+                    response_data = self._send_attempt(client, endpoint, headers, payload, deadline)
+                    # Read timeouts only bound each chunk, so a trickling response can overrun the budget
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise LatencyBudgetExceeded(f"latency budget of {self.latency_budget}s exhausted")
+                    return response_data
+                return self._send_hedged(client, endpoint, headers, payload, deadline, hedge_after)
+            except httpx.HTTPError as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise self._budget_error(e, deadline)
+                attempt += 1
+                self._count_resilience("retries")
+                logger.warning(f"LLM request failed ({e.__class__.__name__}); retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+    
+    async def _apost_json(
+        self,
+        client: httpx.AsyncClient,
+        endpoint: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Async version of _post_json(); losing hedged attempts are cancelled."""
+        deadline = time.monotonic() + self.latency_budget if self.latency_budget else None
+        attempt = 0
+        while True:
+            try:
+                hedge_after = self._hedge_delay()
+                if hedge_after is None:
+                    attempt_coro = self._asend_attempt(client, endpoint, headers, payload, deadline)
+                    if deadline is None:
+                        return await attempt_coro
+                    try:
+                        return await asyncio.wait_for(attempt_coro, timeout=max(0.0, deadline - time.monotonic()))
+                    except asyncio.TimeoutError:
+                        raise LatencyBudgetExceeded(f"latency budget of {self.latency_budget}s exhausted")
+                return await self._asend_hedged(client, endpoint, headers, payload, deadline, hedge_after)
+            except httpx.HTTPError as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise self._budget_error(e, deadline)
+                attempt += 1
+                self._count_resilience("retries")
+                logger.warning(f"LLM request failed ({e.__class__.__name__}); retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+    
+    def _send_attempt(
+        self,
+        client: httpx.Client,
+        endpoint: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+        deadline: Optional[float]
+    ) -> Dict[str, Any]:
+        """Make one request attempt and record its latency."""
+        started = time.monotonic()
+        response = client.post(endpoint, headers=headers, json=payload, timeout=self._attempt_timeout(deadline))
+        response.raise_for_status()
+        response_data = response.json()
+        self._record_latency(time.monotonic() - started)
+        return response_data
+    
+    async def _asend_attempt(
+        self,
+        client: httpx.AsyncClient,
+        endpoint: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+        deadline: Optional[float]
+    ) -> Dict[str, Any]:
+        """Make one async request attempt and record its latency."""
+        started = time.monotonic()
+        response = await client.post(endpoint, headers=headers, json=payload, timeout=self._attempt_timeout(deadline))
+        response.raise_for_status()
+        response_data = response.json()
+        self._record_latency(time.monotonic() - started)
+        return response_data
+    
+    def _send_hedged(
+        self,
+        client: httpx.Client,
+        endpoint: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+        deadline: Optional[float],
+        hedge_after: float
+    ) -> Dict[str, Any]:
+        """Send a duplicate request if the first is slower than hedge_after; first success wins."""
+        executor = self._get_hedge_executor()
+        primary = executor.submit(self._send_attempt, client, endpoint, headers, payload, deadline)
+        pending = {primary}
+        done, _ = concurrent.futures.wait(pending, timeout=hedge_after)
+        if not done:
+            self._count_resilience("hedged_requests")
+            pending.add(executor.submit(self._send_attempt, client, endpoint, headers, payload, deadline))
         
+        error: Optional[BaseException] = None
+        while pending:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = concurrent.futures.wait(pending, timeout=remaining,
+                                                    return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                raise LatencyBudgetExceeded(f"latency budget of {self.latency_budget}s exhausted")
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self._count_resilience("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+    
+    async def _asend_hedged(
+        self,
+        client: httpx.AsyncClient,
+        endpoint: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+        deadline: Optional[float],
+        hedge_after: float
+    ) -> Dict[str, Any]:
+        """Async version of _send_hedged(); the slower attempt is cancelled."""
+        primary = asyncio.ensure_future(self._asend_attempt(client, endpoint, headers, payload, deadline))
+        pending = {primary}
         try:
-            response = client.post(endpoint, headers=headers, json=payload, timeout=timeout)
-            response.raise_for_status()
-            response_data = response.json()
-            
-            # Handle different response formats
-            # Check for LangChain AIMessage format first (has "content" and "type" fields)
-            if "content" in response_data and "type" in response_data and response_data.get("type") == "ai":
-                # This is LangChain AIMessage format
-                content = response_data.get("content", "")
-            elif "choices" in response_data and len(response_data["choices"]) > 0:
-                # This is OpenAI API format
-                content = response_data["choices"][0]["message"]["content"]
-            elif "content" in response_data:
-                # Fallback: just has content field
-                content = response_data.get("content", "")
-            else:
-                # Try to extract content from various possible formats
-                content = response_data.get("text") or response_data.get("message") or str(response_data)
-            
-            # Handle function calling if present
-            if "choices" in response_data and len(response_data["choices"]) > 0:
-                message = response_data["choices"][0]["message"]
-                if "tool_calls" in message and available_functions:
-                    return self._handle_function_calls(
-                        message["tool_calls"], messages, tools, available_functions
-                    )
+            done, _ = await asyncio.wait(pending, timeout=hedge_after)
+            if not done:
+                self._count_resilience("hedged_requests")
+                pending.add(asyncio.ensure_future(self._asend_attempt(client, endpoint, headers, payload, deadline)))
             
-            # Return string content (required by CrewAI)
-            return content if isinstance(content, str) else str(content)
-            
-        except httpx.TimeoutException as e:
-            raise RuntimeError(f"LLM request timed out after 120s. Endpoint: {endpoint}. Error: {str(e)}")
-        except httpx.ConnectError as e:
-            raise RuntimeError(f"Failed to connect to LLM endpoint: {endpoint}. Error: {str(e)}")
-        except httpx.HTTPStatusError as e:
-            raise RuntimeError(f"LLM API returned error {e.response.status_code}: {e.response.text[:200]}. Endpoint: {endpoint}")
-        except httpx.HTTPError as e:
-            raise RuntimeError(f"LLM request failed: {str(e)}. Endpoint: {endpoint}")
-        except (KeyError, IndexError) as e:
-            raise ValueError(f"Invalid response format: {str(e)}. Response: {response_data if 'response_data' in locals() else 'N/A'}")
+            error: Optional[BaseException] = None
+            while pending:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                done, pending = await asyncio.wait(pending, timeout=remaining,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise LatencyBudgetExceeded(f"latency budget of {self.latency_budget}s exhausted")
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._count_resilience("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
         finally:
-            # Only close if we created the client
-            if not self.http_client and client:
-                client.close()
+            for task in pending:
+                task.cancel()
+    
+    def _attempt_timeout(self, deadline: Optional[float]) -> httpx.Timeout:
+        """Per-attempt timeout: 30s connect, 120s read, trimmed to the remaining latency budget."""
+        if deadline is None:
+            return httpx.Timeout(30.0, read=120.0)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LatencyBudgetExceeded(f"latency budget of {self.latency_budget}s exhausted")
+        return httpx.Timeout(min(30.0, remaining), read=min(120.0, remaining))
+    
+    def _retry_delay(self, error: httpx.HTTPError, attempt: int, deadline: Optional[float]) -> Optional[float]:
+        """Seconds to wait before retrying after error, or None if the call should fail now."""
+        if attempt >= self.max_retries or isinstance(error, LatencyBudgetExceeded):
+            return None
+        if isinstance(error, httpx.HTTPStatusError):
+            if error.response.status_code not in RETRYABLE_STATUS_CODES:
+                return None
+        elif not isinstance(error, (httpx.TimeoutException, httpx.ConnectError)):
+            return None
+        
+        # A server asking us to wait longer than retry_backoff_max is treated as a hard failure
+        retry_after = self._retry_after_seconds(error) or 0.0
+        if retry_after > self.retry_backoff_max:
+            logger.warning(f"Retry-After of {retry_after:.1f}s exceeds retry_backoff_max ({self.retry_backoff_max}s); not retrying")
+            return None
+        
+        # Exponential backoff with equal jitter, but never sooner than Retry-After
+        backoff = min(self.retry_backoff_max, self.retry_backoff * (2 ** attempt))
+        delay = max(backoff / 2 + random.uniform(0, backoff / 2), retry_after)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
+    
+    @staticmethod
+    def _retry_after_seconds(error: httpx.HTTPError) -> Optional[float]:
+        """Parse a Retry-After header (seconds or HTTP date) from an error response."""
+        if not isinstance(error, httpx.HTTPStatusError):
+            return None
+        value = error.response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+    
+    def _budget_error(self, error: httpx.HTTPError, deadline: Optional[float]) -> httpx.HTTPError:
+        """Report a timeout that ran into the latency budget as a budget error."""
+        if (deadline is not None and isinstance(error, httpx.TimeoutException)
+                and not isinstance(error, LatencyBudgetExceeded) and time.monotonic() >= deadline):
+            return LatencyBudgetExceeded(f"latency budget of {self.latency_budget}s exhausted: {error}")
+        return error
+    
+    def _hedge_delay(self) -> Optional[float]:
+        """Delay before hedging: hedge_after, else the observed p95 latency once enough samples exist."""
+        if not self.hedge_requests:
+            return None
+        if self.hedge_after is not None:
+            return self.hedge_after
+        with self._client_lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    
+    def _get_hedge_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        """Thread pool running hedged sync attempts (created on first use)."""
+        with self._client_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.pool_limits.max_connections or 20, thread_name_prefix="llm-hedge")
+            return self._hedge_executor
+    
+    def _record_latency(self, seconds: float) -> None:
+        with self._client_lock:
+            self._latencies.append(seconds)
+    
+    def _count_resilience(self, name: str) -> None:
+        with self._client_lock:
+            self._resilience_stats[name] += 1
+    
+    def resilience_stats(self) -> Dict[str, Any]:
+        """Retry and hedging counters plus the observed p95 attempt latency."""
+        with self._client_lock:
+            stats = dict(self._resilience_stats)
+            ordered = sorted(self._latencies)
+        stats["latency_samples"] = len(ordered)
+        stats["p95_latency"] = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else None
+        return stats
+    
+    def _request_error(self, error: httpx.HTTPError, endpoint: str) -> RuntimeError:
+        """Translate an httpx error into the RuntimeError raised to CrewAI."""
+        if isinstance(error, LatencyBudgetExceeded):
+            return RuntimeError(f"LLM request exceeded its latency budget. Endpoint: {endpoint}. Error: {str(error)}")
+        if isinstance(error, httpx.TimeoutException):
+            return RuntimeError(f"LLM request timed out after 120s. Endpoint: {endpoint}. Error: {str(error)}")
+        if isinstance(error, httpx.ConnectError):
+            return RuntimeError(f"Failed to connect to LLM endpoint: {endpoint}. Error: {str(error)}")
+        if isinstance(error, httpx.HTTPStatusError):
+            return RuntimeError(f"LLM API returned error {error.response.status_code}: {error.response.text[:200]}. Endpoint: {endpoint}")
+        return RuntimeError(f"LLM request failed: {str(error)}. Endpoint: {endpoint}")
+    
+    def _parse_stream_line(self, line: str) -> Optional[Any]:
+        """Decode one SSE or newline-delimited JSON line into a chunk dict, None, or _STREAM_DONE."""
+        line = line.strip()
+        if not line or line.startswith((":", "event:", "id:", "retry:")):
+            return None
+        if line.startswith("data:"):
+            line = line[5:].strip()
+        if line == "[DONE]":
+            return _STREAM_DONE
+        try:
+            chunk = json.loads(line)
+        except ValueError:
+            logger.debug(f"Skipping non-JSON stream line: {line[:100]}")
+            return None
+        return chunk if isinstance(chunk, dict) else None
+    
+    def _accumulate_chunk(self, chunk: Dict[str, Any], tool_calls: Dict[int, dict]) -> str:
+        """Return the content token of a stream chunk, merging any tool call deltas into tool_calls."""
+        if "choices" in chunk:
+            # OpenAI format: content and tool calls arrive as deltas
+            if not chunk["choices"]:
+                return ""
+            choice = chunk["choices"][0]
+            delta = choice.get("delta") or choice.get("message") or {}
+            for tool_delta in delta.get("tool_calls") or []:
+                entry = tool_calls.setdefault(tool_delta.get("index", len(tool_calls)), {
+                    "id": None, "type": "function", "function": {"name": "", "arguments": ""}
+                })
+                if tool_delta.get("id"):
+                    entry["id"] = tool_delta["id"]
+                function = tool_delta.get("function") or {}
+                entry["function"]["name"] += function.get("name") or ""
+                entry["function"]["arguments"] += function.get("arguments") or ""
+            content = delta.get("content") or choice.get("text")
+        else:
+            # LangChain AIMessageChunk format (or any chunk with a content field)
+            content = chunk.get("content")
+        
+        if not content:
+            return ""
+        return content if isinstance(content, str) else str(content)
+    
+    def _ordered_tool_calls(self, tool_calls: Dict[int, dict]) -> List[dict]:
+        """Tool calls assembled from stream deltas, in index order."""
+        return [tool_calls[index] for index in sorted(tool_calls)]
+    
+    def _record_stream_stats(self, started: float, first_token_at: Optional[float], token_count: int) -> None:
+        """Store time-to-first-token and throughput of the stream that just ended."""
+        finished = time.perf_counter()
+        generation_time = finished - first_token_at if first_token_at is not None else 0.0
+        self.last_stream_stats = {
+            "time_to_first_token": first_token_at - started if first_token_at is not None else None,
+            "total_time": finished - started,
+            "tokens": token_count,
+            "tokens_per_second": token_count / generation_time if generation_time > 0 else None,
+        }
+        logger.debug(f"Stream stats: {self.last_stream_stats}")
     
     def _handle_function_calls(
         self,
@@ -162,33 +1095,69 @@ class CustomLLMAdapter(BaseLLM):
         available_functions: Dict[str, Any]
     ) -> str:
         """Handle function calling with proper message flow."""
-        import json
+        function_call = self._find_function_call(tool_calls, available_functions)
+        if function_call is None:
+            return "Function call failed"
         
+        # Execute function and add the call and its result to message history
+        tool_call, function_name, function_args = function_call
+        function_result = available_functions[function_name](**function_args)
+        self._append_function_result(messages, tool_call, function_name, function_result)
+        
+        # Call LLM again with updated context
+        return self.call(messages, tools, None, available_functions)
+    
+    async def _ahandle_function_calls(
+        self,
+        tool_calls: List[dict],
+        messages: List[Dict[str, str]],
+        tools: Optional[List[dict]],
+        available_functions: Dict[str, Any]
+    ) -> str:
+        """Async version of _handle_function_calls; awaits coroutine function results."""
+        function_call = self._find_function_call(tool_calls, available_functions)
+        if function_call is None:
+            return "Function call failed"
+        
+        tool_call, function_name, function_args = function_call
+        function_result = available_functions[function_name](**function_args)
+        if inspect.isawaitable(function_result):
+            function_result = await function_result
+        self._append_function_result(messages, tool_call, function_name, function_result)
+        
+        return await self.acall(messages, tools, None, available_functions)
+    
+    def _find_function_call(
+        self,
+        tool_calls: List[dict],
+        available_functions: Dict[str, Any]
+    ) -> Optional[Tuple[dict, str, Dict[str, Any]]]:
+        """Return (tool_call, function name, parsed arguments) for the first callable tool call."""
         for tool_call in tool_calls:
             function_name = tool_call["function"]["name"]
-            
             if function_name in available_functions:
-                # Parse and execute function
-                function_args = json.loads(tool_call["function"]["arguments"])
-                function_result = available_functions[function_name](**function_args)
-                
-                # Add function call and result to message history
-                messages.append({
-                    "role": "assistant",
-                    "content": None,
-                    "tool_calls": [tool_call]
-                })
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call["id"],
-                    "name": function_name,
-                    "content": str(function_result)
-                })
-                
-                # Call LLM again with updated context
-                return self.call(messages, tools, None, available_functions)
-        
-        return "Function call failed"
+                return tool_call, function_name, json.loads(tool_call["function"]["arguments"])
+        return None
+    
+    def _append_function_result(
+        self,
+        messages: List[Dict[str, str]],
+        tool_call: dict,
+        function_name: str,
+        function_result: Any
+    ) -> None:
+        """Add a function call and its result to the message history."""
+        messages.append({
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [tool_call]
+        })
+        messages.append({
+            "role": "tool",
+            "tool_call_id": tool_call["id"],
+            "name": function_name,
+            "content": str(function_result)
+        })
     
     def supports_function_calling(self) -> bool:
         """Return True if your LLM supports function calling."""